@@ -1,80 +1,434 @@
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory
+from flask import Flask, Request, Response, g, render_template, request, redirect, url_for, send_from_directory
 import os
+import time
 import cv2
+import functools
+import hashlib
+import io
+import json
 import uuid
+import zipfile
 import numpy as np
-import pillow_heif
 from PIL import Image
 
 # Import fungsi enhancement
-from utils.enhance import (
-    auto_enhance,
-    denoise_bilateral,
-    white_balance_grayworld,
-    enhance_contrast_clahe,
-    enhance_saturation,
-    unsharp_masking,
-    gamma_correction
-)
+from utils.analysis import ImageAnalysis, analyze_proxy
+from utils.batch import run_batch
+from utils.buffers import clahe_cache
+from utils.enhance import auto_enhance, choose_denoise_backend
+from utils.image_cache import ImageCache
+from utils.ingest import decode_upload
+from utils.jobs import JobQueue, QueueFull
+from utils.metrics import REQUEST_SECONDS, collect_timings, render_metrics, timed
+from utils import parallel
+from utils.pipeline import parse_manual_params, run_manual_pipeline
+from utils.pointops import table_cache_stats
+from utils.preview import make_proxy, scale_manual_params
+from utils.render_slots import RenderSlots, Superseded
+from utils.renditions import (DEFAULT_QUALITY, IMAGE_FORMATS, Rendition, encode_image, is_downscaled,
+                              parse_rendition_names, render_renditions)
+from utils.result_cache import ResultCache, cache_key, file_digest
+from utils.result_store import ResultStore
+from utils import shared_store
+from utils.tiles import StripRunner, analyze_tiled, split_strip_height
 
 app = Flask(__name__)
 UPLOAD_FOLDER = 'static/uploads'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 🔒 Batas upload 10 MB
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 10)) * 1024 * 1024  # 🔒 Batas upload (default 10 MB)
+app.config['IMAGE_CACHE_BYTES'] = int(os.environ.get('IMAGE_CACHE_BYTES', 256 * 1024 * 1024))
+app.config['STAGE_CACHE_BYTES'] = int(os.environ.get('STAGE_CACHE_BYTES', 256 * 1024 * 1024))
+# Simpan juga versi resolusi penuh (di atas 1920x1080) untuk render full_resolution
+app.config['KEEP_FULL_RESOLUTION'] = os.environ.get('KEEP_FULL_RESOLUTION', '0') == '1'
+app.config['TILE_STRIP_HEIGHT'] = int(os.environ.get('TILE_STRIP_HEIGHT', 512))
+app.config['TILE_THREADS'] = int(os.environ.get('TILE_THREADS', 1))
+app.config['RESULT_TTL_SECONDS'] = int(os.environ.get('RESULT_TTL_SECONDS', 3600))
+app.config['RESULT_STORE_BYTES'] = int(os.environ.get('RESULT_STORE_BYTES', 1024 * 1024 * 1024))
+# Batas waktu denoise noise berat (ms); di atas ini dipakai backend NLM yang lebih cepat
+app.config['DENOISE_BUDGET_MS'] = float(os.environ.get('DENOISE_BUDGET_MS', 1000))
+# Analisis auto enhance dari proxy piramida + patch resolusi penuh (biaya
+# hampir konstan terhadap ukuran gambar) alih-alih frame penuh
+app.config['PROXY_ANALYSIS'] = os.environ.get('PROXY_ANALYSIS', '0') == '1'
+# Pipeline manual: jalankan saturasi sebagai skala chroma di buffer LAB
+# setelah CLAHE (tanpa round trip HSV); hasil saturasi sedikit berbeda
+app.config['FUSE_COLOR_STAGES'] = os.environ.get('FUSE_COLOR_STAGES', '0') == '1'
+# Thread pool bersama untuk analisis paralel dan render preview per strip
+# (1 = serial), dan thread internal OpenCV (-1 = default OpenCV). Di bawah
+# gunicorn, batasi keduanya sesuai jumlah core / jumlah worker.
+app.config['PARALLEL_THREADS'] = int(os.environ.get('PARALLEL_THREADS', parallel.DEFAULT_THREADS))
+app.config['OPENCV_THREADS'] = int(os.environ.get('OPENCV_THREADS', -1))
+# Simpan hasil decode upload langsung di cache memori, sehingga enhancement
+# memakai pixel asli, bukan hasil decode ulang JPEG di disk
+app.config['KEEP_UPLOADS_IN_MEMORY'] = os.environ.get('KEEP_UPLOADS_IN_MEMORY', '0') == '1'
+# Job queue asinkron: jumlah job berat yang berjalan bersamaan, batas antrian
+# (lebih dari ini dijawab 429), dan lama status job disimpan setelah selesai
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_QUEUE_DEPTH'] = int(os.environ.get('JOB_QUEUE_DEPTH', 16))
+app.config['JOB_TTL_SECONDS'] = int(os.environ.get('JOB_TTL_SECONDS', 600))
+app.config['JOB_RETRY_AFTER'] = int(os.environ.get('JOB_RETRY_AFTER', 5))
+# Editor memakai /jobs untuk auto enhance hanya jika diaktifkan: status job
+# ada di memori proses, jadi polling harus sampai ke worker yang sama
+# (satu worker gunicorn dengan beberapa thread, atau sticky session)
+app.config['ASYNC_JOBS_UI'] = os.environ.get('ASYNC_JOBS_UI', '0') == '1'
+# Cache hasil berdasarkan isi gambar + parameter (0 = nonaktif)
+app.config['RESULT_CACHE_BYTES'] = int(os.environ.get('RESULT_CACHE_BYTES', 512 * 1024 * 1024))
+# Original hasil decode sebagai .npy yang di-memory-map oleh semua worker
+# (0 = nonaktif; juga nonaktif di platform tanpa flock, misalnya Windows).
+# Dibatasi setengah ukuran filesystem folder; jika tetap penuh, original
+# disimpan di cache per proses
+app.config['SHARED_ORIGINALS_BYTES'] = int(os.environ.get('SHARED_ORIGINALS_BYTES', 1024 * 1024 * 1024))
+app.config['SHARED_ORIGINALS_FOLDER'] = os.environ.get('SHARED_ORIGINALS_FOLDER', shared_store.DEFAULT_FOLDER)
+# Satu render /manual_enhance per gambar: request slider yang lebih baru
+# membatalkan yang lama (menunggu atau di antara stage), dijawab HTTP 409
+app.config['RENDER_SLOTS'] = os.environ.get('RENDER_SLOTS', '1') == '1'
+# Rendition tambahan hasil (renditions=display,thumbnail di request): sisi
+# terpanjang, format (jpeg/webp), dan kualitas; semua di-encode paralel
+# dari buffer hasil yang sama. JPEG progressive opsional.
+app.config['DISPLAY_LONG_EDGE'] = int(os.environ.get('DISPLAY_LONG_EDGE', 1280))
+app.config['THUMBNAIL_LONG_EDGE'] = int(os.environ.get('THUMBNAIL_LONG_EDGE', 320))
+app.config['RENDITION_FORMAT'] = os.environ.get('RENDITION_FORMAT', 'webp').lower()
+app.config['RENDITION_QUALITY'] = int(os.environ.get('RENDITION_QUALITY', 80))
+app.config['PROGRESSIVE_JPEG'] = os.environ.get('PROGRESSIVE_JPEG', '0') == '1'
+# Batas /batch_enhance: jumlah gambar dan total ukuran tak terkompresi isi
+# arsip zip (ukuran upload sendiri sudah dibatasi MAX_CONTENT_LENGTH)
+app.config['BATCH_MAX_FILES'] = int(os.environ.get('BATCH_MAX_FILES', 500))
+app.config['BATCH_MAX_UNCOMPRESSED_MB'] = int(os.environ.get('BATCH_MAX_UNCOMPRESSED_MB', 512))
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+parallel.configure(app.config['PARALLEL_THREADS'],
+                   app.config['OPENCV_THREADS'] if app.config['OPENCV_THREADS'] >= 0 else None)
 
 MAX_WIDTH = 1920
 MAX_HEIGHT = 1080
 
-def convert_heic_to_jpg(file_path, save_folder):
-    """Konversi HEIC ke JPG dengan resize menggunakan pillow-heif"""
-    heif_file = pillow_heif.read_heif(file_path)
-    image = Image.frombytes(
-        heif_file.mode,
-        heif_file.size,
-        heif_file.data
-    )
-    image = resize_image(image)
-    if image.mode in ("RGBA", "P"):
-        image = image.convert("RGB")
-    new_filename = f"{uuid.uuid4().hex}_original.jpg"
-    new_path = os.path.join(save_folder, new_filename)
-    image.save(new_path, "JPEG", quality=85)
-    return new_filename
-
-
-def resize_image(image):
-    """Resize gambar jika terlalu besar"""
-    width, height = image.size
-    if width > MAX_WIDTH or height > MAX_HEIGHT:
-        ratio = min(MAX_WIDTH / width, MAX_HEIGHT / height)
-        new_size = (int(width * ratio), int(height * ratio))
-        return image.resize(new_size, Image.LANCZOS)
-    return image
-
-def save_image(image, suffix="enhanced"):
-    """Simpan gambar ke folder upload dan kembalikan nama file baru"""
-    filename = f"{uuid.uuid4().hex}_{suffix}.jpg"
+# Cache gambar original yang sudah di-decode (per proses)
+image_cache = ImageCache(app.config['IMAGE_CACHE_BYTES'])
+# Cache hasil per stage pipeline manual (prefix parameter)
+stage_cache = ImageCache(app.config['STAGE_CACHE_BYTES'])
+# Indeks file hasil; file lama dihapus oleh janitor di background
+result_store = ResultStore(UPLOAD_FOLDER,
+                           ttl_seconds=app.config['RESULT_TTL_SECONDS'],
+                           max_bytes=app.config['RESULT_STORE_BYTES'])
+# Hasil yang sudah pernah dihitung (gambar + parameter sama), dibagi antar worker lewat disk
+result_cache = ResultCache(UPLOAD_FOLDER, app.config['RESULT_CACHE_BYTES']) if app.config['RESULT_CACHE_BYTES'] > 0 else None
+# Original yang sudah di-decode, dibagi antar worker lewat memory map
+shared_originals = None
+if app.config['SHARED_ORIGINALS_BYTES'] > 0 and shared_store.available():
+    shared_originals = shared_store.SharedImageStore(app.config['SHARED_ORIGINALS_FOLDER'],
+                                                     app.config['SHARED_ORIGINALS_BYTES'])
+# Antrian job per proses (status tidak dibagi antar worker gunicorn)
+job_queue = JobQueue(workers=app.config['JOB_WORKERS'],
+                     max_pending=app.config['JOB_QUEUE_DEPTH'],
+                     ttl_seconds=app.config['JOB_TTL_SECONDS'])
+# Slot render per gambar untuk /manual_enhance (per proses)
+render_slots = RenderSlots() if app.config['RENDER_SLOTS'] else None
+
+class UploadRequest(Request):
+    """
+    Request yang menyimpan file upload di memori (BytesIO) alih-alih file
+    sementara di disk; ukurannya sudah dibatasi MAX_CONTENT_LENGTH.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+app.request_class = UploadRequest
+
+def save_upload(file):
+    """
+    Simpan upload sebagai *_original.jpg (maks 1920x1080) dan kembalikan
+    nama filenya. Jika KEEP_FULL_RESOLUTION aktif dan gambar lebih besar,
+    versi resolusi penuh disimpan sebagai *_full.jpg.
+    """
+    resized, full = decode_upload(file.stream, (MAX_WIDTH, MAX_HEIGHT),
+                                  keep_full=app.config['KEEP_FULL_RESOLUTION'])
+
+    filename = f"{uuid.uuid4().hex}_original.jpg"
+    if full is not None:
+        write_jpeg(full, full_resolution_path(filename), quality=95)
+    write_jpeg(resized, os.path.join(app.config['UPLOAD_FOLDER'], filename), quality=85)
+    image_cache.invalidate(filename)
+    if app.config['KEEP_UPLOADS_IN_MEMORY']:
+        # File di disk tetap ditulis untuk ditampilkan dan sebagai fallback
+        # setelah evict atau di worker lain
+        # Store bersama penuh (put None): simpan di cache per proses
+        if shared_originals is None or shared_originals.put(filename, resized) is None:
+            image_cache.put(filename, resized)
+    return filename
+
+def write_jpeg(image, path, quality):
+    """Simpan array BGR sebagai JPEG (encode dan tulis disk diukur terpisah)"""
+    encoded = encode_image(image, 'jpeg', quality)
+    with timed('disk_write'):
+        with open(path, 'wb') as f:
+            f.write(encoded)
+
+def full_resolution_path(filename):
+    """Path versi resolusi penuh dari sebuah *_original.jpg"""
+    name = filename.replace('_original.jpg', '_full.jpg')
+    return os.path.join(app.config['UPLOAD_FOLDER'], name)
+
+def load_full_resolution(filename):
+    """
+    Baca versi resolusi penuh (tidak di-cache per proses karena ukurannya
+    besar, tetapi bisa dari store bersama). Jika tidak ada, kembalikan
+    original biasa.
+    """
+    path = full_resolution_path(filename)
+    if os.path.exists(path):
+        return load_shared(f"{filename}@full", path)
+    return load_original(filename)
+
+def load_shared(key, path, fallback_cache=None):
+    """
+    Gambar dari store bersama (memory map, tanpa decode); decode dari disk
+    dan simpan ke store jika belum ada. Tanpa store, selalu decode. Jika
+    store gagal ditulis (misalnya /dev/shm penuh), hasil decode dipakai
+    langsung dan disimpan di fallback_cache jika ada.
+    """
+    img = shared_originals.get(key) if shared_originals is not None else None
+    if img is None and fallback_cache is not None:
+        img = fallback_cache.get(key)
+    if img is None:
+        with timed('decode'):
+            img = cv2.imread(path)
+        if img is not None and shared_originals is not None:
+            stored = shared_originals.put(key, img)
+            if stored is not None:
+                return stored
+        if img is not None and fallback_cache is not None:
+            img = fallback_cache.put(key, img)
+    return img
+
+def strip_runner():
+    """Runner per strip untuk render resolusi penuh dengan memori terbatas"""
+    return StripRunner(app.config['TILE_STRIP_HEIGHT'], app.config['TILE_THREADS'])
+
+def preview_runner(proxy):
+    """
+    Runner preview: proxy dibagi menjadi satu strip per thread pool
+    bersama sehingga stage dirender paralel. None jika pool tidak aktif.
+    """
+    pool = parallel.get_pool()
+    if pool is None:
+        return None
+    return StripRunner(split_strip_height(proxy.shape[0], parallel.thread_count()), pool=pool)
+
+
+def save_image(encoded, suffix="enhanced", owner=None, ext='.jpg'):
+    """
+    Simpan gambar ter-encode (lihat encode_image) ke folder upload
+    dan kembalikan nama file baru. Jika owner (nama file original)
+    diberikan, hasil dicatat di result store dan menggantikan hasil
+    sebelumnya dengan suffix yang sama.
+    """
+    filename = f"{uuid.uuid4().hex}_{suffix}{ext}"
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    cv2.imwrite(filepath, image)
+    with timed('disk_write'):
+        with open(filepath, 'wb') as f:
+            f.write(encoded)
+    if owner is not None:
+        result_store.register(owner, filename, suffix)
     return filename
 
-def remove_all_enhanced_images():
-    """Hapus semua file *_auto.jpg dan *_manual.jpg dari folder upload"""
-    folder = app.config['UPLOAD_FOLDER']
-    for fname in os.listdir(folder):
-        if fname.endswith('_auto.jpg') or fname.endswith('_manual.jpg'):
-            try:
-                os.remove(os.path.join(folder, fname))
-            except Exception as e:
-                print(f"Error deleting {fname}: {e}")
+def rendition_specs(names, fmt, quality):
+    """Rendition hasil: full (format dan kualitas hasil utama) lalu rendition tambahan"""
+    progressive = app.config['PROGRESSIVE_JPEG']
+    long_edges = {'display': app.config['DISPLAY_LONG_EDGE'], 'thumbnail': app.config['THUMBNAIL_LONG_EDGE']}
+    specs = [Rendition('full', None, fmt, quality, progressive)]
+    for name in names:
+        specs.append(Rendition(name, long_edges[name], app.config['RENDITION_FORMAT'],
+                               app.config['RENDITION_QUALITY'], progressive))
+    return specs
+
+def rendition_key(key, spec):
+    """Kunci result cache rendition; hasil utama memakai kunci request"""
+    return key if spec.name == 'full' else cache_key(key, spec.name)
+
+def save_renditions(img, specs, key, kind, owner, meta=None):
+    """
+    Encode semua rendition dari buffer hasil (paralel) dan simpan ke
+    result cache, atau sebagai file hasil (suffix <kind>_<rendition>).
+    Di cache, hasil utama ditulis terakhir dengan daftar rendition di
+    metadata-nya, sehingga cache hit berarti semua rendition lengkap.
+
+    Rendition yang tidak lebih kecil dari img (lihat is_downscaled) tidak
+    di-encode; entrinya menunjuk ke file hasil utama.
+
+    Returns: (daftar rendition untuk response, encoded hasil utama)
+    """
+    names = [spec.name for spec in specs]
+    aliases = [spec for spec in specs[1:] if not is_downscaled(spec, img.shape)]
+    rendered = render_renditions(img, [spec for spec in specs if spec not in aliases], parallel.get_pool())
+    entries = [None] * len(rendered)
+
+    def add_aliases(full_entry):
+        # Urutan entri tetap mengikuti specs
+        entries.extend(dict(full_entry, name=alias.name) for alias in aliases)
+        entries.sort(key=lambda entry: names.index(entry['name']))
+
+    for i in list(range(1, len(rendered))) + [0]:
+        spec, encoded, (height, width) = rendered[i]
+        ext = IMAGE_FORMATS[spec.fmt][0]
+        entry = {'name': spec.name, 'width': width, 'height': height,
+                 'format': spec.fmt, 'bytes': int(encoded.size)}
+        entries[i] = entry
+        if key:
+            entry['filename'] = result_cache.filename(rendition_key(key, spec), ext)
+        else:
+            entry['filename'] = save_image(encoded, suffix=kind if i == 0 else f"{kind}_{spec.name}",
+                                           owner=owner, ext=ext)
+        if i == 0:
+            add_aliases(entry)
+        if key:
+            with timed('disk_write'):
+                result_cache.put(rendition_key(key, spec), ext, encoded,
+                                 dict(meta or {}, renditions=entries) if i == 0 else None)
+    return entries, rendered[0][1]
+
+def cached_renditions(key, meta):
+    """Daftar rendition dari metadata cache; None jika ada rendition yang sudah di-evict"""
+    entries = meta.get('renditions')
+    if entries is None:
+        return None
+    for entry in entries[1:]:
+        if entry['filename'] == entries[0]['filename']:
+            continue
+        if result_cache.get(cache_key(key, entry['name']), IMAGE_FORMATS[entry['format']][0]) is None:
+            return None
+    return entries
+
+def parse_output_options(values):
+    """
+    Opsi output dari form/JSON: inline (kirim gambar langsung sebagai
+    body response, tanpa file di disk), format (jpeg/webp), dan quality
+    (1-100). Hasil yang disimpan sebagai file selalu JPEG kualitas default.
+    Returns: (inline, format, quality), ValueError jika tidak valid.
+    """
+    fmt = str(values.get('format') or 'jpeg').lower()
+    if fmt == 'jpg':
+        fmt = 'jpeg'
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f"Format tidak didukung: {fmt}")
+    quality = str(values.get('quality') or DEFAULT_QUALITY)
+    if not quality.isdigit() or not 1 <= int(quality) <= 100:
+        raise ValueError("Quality harus berupa angka 1-100")
+    quality = int(quality)
+    if not is_truthy(values.get('inline')):
+        return False, 'jpeg', DEFAULT_QUALITY
+    return True, fmt, quality
+
+def image_response(encoded, fmt, params_used=None, preview=False, timings=None):
+    """
+    Response berisi gambar hasil yang sudah di-encode (bytes/ndarray).
+    Metadata dikirim di header: X-Params-Used, X-Preview, dan X-Timings
+    (jika diminta).
+    """
+    body = encoded.tobytes() if isinstance(encoded, np.ndarray) else encoded
+    response = Response(body, mimetype=IMAGE_FORMATS[fmt][1])
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Preview'] = str(preview).lower()
+    if params_used is not None:
+        response.headers['X-Params-Used'] = json.dumps(params_used, default=float)
+    if timings is not None:
+        response.headers['X-Timings'] = json.dumps(timings)
+    return response
+
+@functools.lru_cache(maxsize=4096)
+def source_digest(path):
+    """Hash isi file sumber (original tidak pernah ditimpa, aman di-cache per path)"""
+    return file_digest(path)
+
+@functools.lru_cache(maxsize=4096)
+def source_pixels(path):
+    """Jumlah pixel file sumber dari header (tanpa decode)"""
+    with Image.open(path) as image:
+        return image.width * image.height
+
+def source_path(filename, full_resolution):
+    """Path file yang dirender (versi resolusi penuh jika diminta dan ada); None jika tidak ada"""
+    if not filename:
+        return None
+    path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if full_resolution and os.path.exists(full_resolution_path(filename)):
+        path = full_resolution_path(filename)
+    return path if os.path.isfile(path) else None
+
+def denoise_backend_for(filename, full_resolution):
+    """
+    Backend denoise untuk satu request auto, dipilih sekali dari ukuran
+    gambar resolusi penuh sebelum render (preview memakai backend yang
+    sama). Ikut masuk kunci cache, sehingga hasil dengan backend lain
+    tidak dipakai ulang setelah model biaya berubah.
+    """
+    path = source_path(filename, full_resolution)
+    if path is None:
+        return None
+    try:
+        pixels = source_pixels(path)
+    except (OSError, Image.DecompressionBombError):
+        return None
+    return choose_denoise_backend(pixels, app.config['DENOISE_BUDGET_MS'])
+
+def result_key(mode, filename, full_resolution, *parts):
+    """
+    Kunci result cache: isi file sumber + mode + parameter kanonik.
+    None jika cache nonaktif atau file sumber tidak ada.
+    """
+    if result_cache is None:
+        return None
+    path = source_path(filename, full_resolution)
+    if path is None:
+        return None
+    with timed('cache_lookup'):
+        digest = source_digest(path)
+    # Original di memori (bukan hasil decode JPEG) memberi pixel sedikit berbeda
+    return cache_key(mode, digest, app.config['KEEP_UPLOADS_IN_MEMORY'], *parts)
+
+def load_original(filename):
+    """Baca gambar original dari store bersama atau cache, decode dari disk jika belum ada"""
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if shared_originals is not None:
+        return load_shared(filename, filepath, fallback_cache=image_cache)
+    return image_cache.load(filename, filepath)
+
+def load_preview(filename):
+    """
+    Baca gambar original beserta proxy preview-nya (di-cache).
+
+    Returns: (original, proxy, scale) atau (None, None, None)
+    """
+    img = load_original(filename)
+    if img is None:
+        return None, None, None
+    key = f"{filename}@preview"
+    proxy = image_cache.get(key)
+    if proxy is None:
+        with timed('make_proxy', img):
+            proxy = image_cache.put(key, make_proxy(img)[0])
+    scale = max(proxy.shape[:2]) / max(img.shape[:2])
+    return img, proxy, scale
+
+def is_truthy(value):
+    """Interpretasi flag dari form/JSON"""
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
 
 def allowed_file(filename):
     """Validasi ekstensi file"""
     ext = os.path.splitext(filename)[1].lower()
     return ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.webp', '.heif', '.heic']
 
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    # Request static dan 404 tidak dicatat
+    if request.endpoint not in (None, 'static') and 'request_start' in g:
+        REQUEST_SECONDS.observe(request.endpoint, time.perf_counter() - g.request_start)
+    return response
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
@@ -87,21 +441,8 @@ def index():
                 ".jpg, .jpeg, .png, .bmp, .tiff, .tif, .webp, .heif, .heic."
             ), 400
 
-        ext = os.path.splitext(file.filename)[1].lower()
         try:
-            if ext == '.heic':
-                temp_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_temp.heic")
-                file.save(temp_path)
-                filename = convert_heic_to_jpg(temp_path, app.config['UPLOAD_FOLDER'])
-                os.remove(temp_path)
-            else:
-                image = Image.open(file.stream)
-                image = resize_image(image)
-                if image.mode in ("RGBA", "P"):  # Konversi jika perlu
-                    image = image.convert("RGB")
-                filename = f"{uuid.uuid4().hex}_original.jpg"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                image.save(filepath, "JPEG", quality=85)
+            filename = save_upload(file)
 
         except Exception as e:
             print(f"Error processing image: {e}")
@@ -120,78 +461,398 @@ def editor():
         if file.filename == '' or not allowed_file(file.filename):
             return "Unsupported file format. Please upload JPG, PNG, or HEIC.", 400
 
-        ext = os.path.splitext(file.filename)[1].lower()
         try:
-            if ext == '.heic':
-                temp_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_temp.heic")
-                file.save(temp_path)
-                filename = convert_heic_to_jpg(temp_path, app.config['UPLOAD_FOLDER'])
-                os.remove(temp_path)
-            else:
-                image = Image.open(file.stream)
-                image = resize_image(image)
-                if image.mode in ("RGBA", "P"):
-                    image = image.convert("RGB")
-                filename = f"{uuid.uuid4().hex}_original.jpg"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                image.save(filepath, "JPEG", quality=85)
+            filename = save_upload(file)
 
         except Exception as e:
             print(f"Error processing image: {e}")
             return "Error processing image.", 500
 
-        return render_template('editor.html', filename=filename)
-
-    return render_template('editor.html', filename=None)
-
-@app.route('/auto_enhance', methods=['POST'])
-def auto_enhance_route():
-    filename = request.form.get('filename')
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    img = cv2.imread(filepath)
+        return render_template('editor.html', filename=filename, async_jobs=app.config['ASYNC_JOBS_UI'])
+
+    return render_template('editor.html', filename=None, async_jobs=app.config['ASYNC_JOBS_UI'])
+
+def enhance_auto(values):
+    """
+    Auto enhance sesuai opsi form (filename, preview, full_resolution,
+    inline, timings). Dipakai oleh route sinkron dan job queue.
+    """
+    filename = values.get('filename')
+    preview = is_truthy(values.get('preview'))
+    full_resolution = is_truthy(values.get('full_resolution'))
+    try:
+        inline, fmt, quality = parse_output_options(values)
+        names = () if inline else parse_rendition_names(values.get('renditions'))
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    specs = rendition_specs(names, fmt, quality) if names else None
+    renditions = None
+    with collect_timings() as timings:
+        backend = denoise_backend_for(filename, full_resolution)
+        key = result_key('auto', filename, full_resolution, preview, fmt, quality,
+                         backend, app.config['PROXY_ANALYSIS'],
+                         *([specs] if specs else []))
+        cached = result_cache.get(key, IMAGE_FORMATS[fmt][0], read=inline) if key else None
+        if cached is not None and specs:
+            renditions = cached_renditions(key, cached[1])
+            if renditions is None:
+                cached = None
+        if cached is not None:
+            result_filename, meta = cached[:2]
+            params_used = meta['params_used']
+            if inline:
+                encoded = cached[2]
+        else:
+            rendered = render_auto(filename, preview, full_resolution, backend)
+            if rendered is None:
+                return {'error': 'Gambar tidak dapat dibaca. Pastikan format file didukung.'}, 400
+            enhanced_img, params_used = rendered
+            if specs:
+                renditions, encoded = save_renditions(enhanced_img, specs, key, "preview" if preview else "auto",
+                                                      filename, {'params_used': params_used})
+                result_filename = renditions[0]['filename']
+            else:
+                encoded = encode_image(enhanced_img, fmt, quality)
+                if key:
+                    with timed('disk_write'):
+                        result_filename = result_cache.put(key, IMAGE_FORMATS[fmt][0], encoded,
+                                                           {'params_used': params_used})
+                elif not inline:
+                    result_filename = save_image(encoded, suffix="preview" if preview else "auto", owner=filename)
+
+        if inline:
+            return image_response(encoded, fmt, params_used, preview,
+                                  timings if is_truthy(values.get('timings')) else None)
+
+    response = {
+        'filename': result_filename,
+        'params_used': params_used,
+        'preview': preview
+    }
+    if renditions is not None:
+        response['renditions'] = renditions
+    if is_truthy(values.get('timings')):
+        response['timings'] = timings
+    return response
+
+def render_auto(filename, preview, full_resolution, denoise_backend=None):
+    """
+    Render auto enhance; kembalikan (gambar, params_used) atau None jika
+    gambar tidak terbaca. denoise_backend: lihat denoise_backend_for
+    (None = dipilih auto_enhance dari DENOISE_BUDGET_MS).
+    """
+    if preview:
+        img, proxy, scale = load_preview(filename)
+    elif full_resolution:
+        img = load_full_resolution(filename)
+    else:
+        img = load_original(filename)
 
     if img is None:
-        return {'error': 'Gambar tidak dapat dibaca. Pastikan format file didukung.'}, 400
-
-    remove_all_enhanced_images()
+        return None
+
+    analysis = None
+    if app.config['PROXY_ANALYSIS']:
+        with timed('analysis.proxy', img):
+            analysis = analyze_proxy(img)
+
+    if preview:
+        # Keputusan dari analisis resolusi penuh, render pada proxy
+        return auto_enhance(proxy, analysis=analysis or ImageAnalysis(img),
+                            spatial_scale=scale,
+                            runner=preview_runner(proxy),
+                            denoise_budget_ms=app.config['DENOISE_BUDGET_MS'],
+                            denoise_backend=denoise_backend,
+                            pool=parallel.get_pool())
+    if full_resolution:
+        if analysis is None:
+            # Statistik global dari proxy, metrik skala (noise/blur) per strip
+            with timed('analysis.tiled', img):
+                analysis = analyze_tiled(img)
+        return auto_enhance(img, analysis=analysis,
+                            runner=strip_runner(),
+                            denoise_budget_ms=app.config['DENOISE_BUDGET_MS'],
+                            denoise_backend=denoise_backend,
+                            pool=parallel.get_pool())
+    return auto_enhance(img, analysis=analysis,
+                        denoise_budget_ms=app.config['DENOISE_BUDGET_MS'],
+                        denoise_backend=denoise_backend,
+                        pool=parallel.get_pool())
+
+def enhance_manual(data, check=None):
+    """
+    Enhancement manual sesuai JSON request (parameter slider dan opsi
+    yang sama dengan enhance_auto). Dipakai oleh route sinkron dan job queue.
+    check (opsional) dipanggil di antara stage dan sebelum encode untuk
+    membatalkan render yang sudah digantikan (lihat RenderSlots).
+    """
+    filename = data.get('filename')
+    preview = is_truthy(data.get('preview'))
+    full_resolution = is_truthy(data.get('full_resolution'))
+    try:
+        inline, fmt, quality = parse_output_options(data)
+        names = () if inline else parse_rendition_names(data.get('renditions'))
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    params = parse_manual_params(data)
+    specs = rendition_specs(names, fmt, quality) if names else None
+    renditions = None
+    with collect_timings() as timings:
+        key = result_key('manual', filename, full_resolution, preview, fmt, quality, params,
+                         app.config['FUSE_COLOR_STAGES'], *([specs] if specs else []))
+        cached = result_cache.get(key, IMAGE_FORMATS[fmt][0], read=inline) if key else None
+        if cached is not None and specs:
+            renditions = cached_renditions(key, cached[1])
+            if renditions is None:
+                cached = None
+        if cached is not None:
+            result_filename = cached[0]
+            if inline:
+                encoded = cached[2]
+        else:
+            img = render_manual(filename, params, preview, full_resolution, check)
+            if img is None:
+                return {'error': 'Gambar tidak dapat dibaca. Pastikan format file didukung.'}, 400
+            if check is not None:
+                check()
+            if specs:
+                renditions, encoded = save_renditions(img, specs, key, "preview" if preview else "manual", filename)
+                result_filename = renditions[0]['filename']
+            else:
+                encoded = encode_image(img, fmt, quality)
+                if key:
+                    with timed('disk_write'):
+                        result_filename = result_cache.put(key, IMAGE_FORMATS[fmt][0], encoded)
+                elif not inline:
+                    result_filename = save_image(encoded, suffix="preview" if preview else "manual", owner=filename)
+
+        if inline:
+            return image_response(encoded, fmt, preview=preview,
+                                  timings=timings if is_truthy(data.get('timings')) else None)
+
+    response = {'filename': result_filename, 'preview': preview}
+    if renditions is not None:
+        response['renditions'] = renditions
+    if is_truthy(data.get('timings')):
+        response['timings'] = timings
+    return response
+
+def render_manual(filename, params, preview, full_resolution, check=None):
+    """Render pipeline manual; kembalikan gambar atau None jika gambar tidak terbaca"""
+    if preview:
+        img, proxy, scale = load_preview(filename)
+    elif full_resolution:
+        img = load_full_resolution(filename)
+    else:
+        img = load_original(filename)
 
-    enhanced_img, params_used = auto_enhance(img)
-    result_filename = save_image(enhanced_img, suffix="auto")
+    if img is None:
+        return None
+
+    fuse_color = app.config['FUSE_COLOR_STAGES']
+    if preview:
+        return run_manual_pipeline(proxy, scale_manual_params(params, scale),
+                                   image_key=f"{filename}@preview", cache=stage_cache,
+                                   runner=preview_runner(proxy), fuse_color=fuse_color, check=check)
+    if full_resolution:
+        # Slider dikalibrasi pada original (maks 1920x1080): parameter
+        # spasial diperbesar sesuai rasio sisi terpanjang, seperti preview
+        original = load_original(filename)
+        if original is not None:
+            params = scale_manual_params(params, max(img.shape[:2]) / max(original.shape[:2]))
+        return run_manual_pipeline(img, params, runner=strip_runner(), fuse_color=fuse_color, check=check)
+    return run_manual_pipeline(img, params, image_key=filename, cache=stage_cache, fuse_color=fuse_color,
+                               check=check)
 
-    return {
-        'filename': result_filename,
-        'params_used': params_used
-    }
+@app.route('/auto_enhance', methods=['POST'])
+def auto_enhance_route():
+    return enhance_auto(request.form)
 
 @app.route('/manual_enhance', methods=['POST'])
 def manual_enhance_route():
+    """
+    Render manual sinkron. Dengan RENDER_SLOTS, request untuk gambar (dan
+    mode preview) yang sama saling menggantikan: hanya yang terbaru yang
+    diselesaikan, yang lama dijawab 409 dengan superseded = true.
+    """
     data = request.json
-    filename = data.get('filename')
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    img = cv2.imread(filepath)
+    if render_slots is None:
+        return enhance_manual(data)
+    slot_key = (data.get('filename'), is_truthy(data.get('preview')), is_truthy(data.get('full_resolution')))
+    try:
+        with render_slots.slot(slot_key) as check:
+            return enhance_manual(data, check)
+    except Superseded as e:
+        return {'error': str(e), 'superseded': True}, 409
+
+def run_job(fn, values):
+    """Jalankan enhance_auto/enhance_manual di worker job; error request menjadi exception"""
+    result = fn(values)
+    if isinstance(result, tuple):
+        body, _ = result
+        raise ValueError(body['error'])
+    return result
+
+def submit_job(fn, values):
+    """Daftarkan job; hasil selalu disimpan sebagai file (inline tidak berlaku)"""
+    values = dict(values, inline=False)
+    try:
+        job_id = job_queue.submit(run_job, fn, values)
+    except QueueFull as e:
+        return {'error': str(e)}, 429, {'Retry-After': str(app.config['JOB_RETRY_AFTER'])}
+    return {
+        'job_id': job_id,
+        'status_url': url_for('job_status', job_id=job_id),
+        'events_url': url_for('job_events', job_id=job_id)
+    }, 202
+
+@app.route('/jobs/auto_enhance', methods=['POST'])
+def auto_enhance_job():
+    """Versi asinkron /auto_enhance: kembalikan job_id, hasil diambil lewat /jobs/<id>"""
+    return submit_job(enhance_auto, request.form.to_dict())
+
+@app.route('/jobs/manual_enhance', methods=['POST'])
+def manual_enhance_job():
+    """Versi asinkron /manual_enhance"""
+    return submit_job(enhance_manual, request.json)
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return {'error': 'Job tidak ditemukan.'}, 404
+    return app.response_class(json.dumps(job, default=float), mimetype='application/json')
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Server-sent events: satu event per perubahan status (queued, running,
+    done, error) sampai job selesai, dengan komentar keep-alive.
+
+    Stream ini memegang satu worker request selama job berjalan. Pakai
+    hanya dengan worker berthread atau async (gunicorn --threads N atau
+    -k gevent); dengan worker sync biasa, pakai polling GET /jobs/<id>.
+    """
+    def generate():
+        status = None
+        while True:
+            job = job_queue.wait(job_id, status)
+            if job is None:
+                yield 'event: error\ndata: {"error": "Job tidak ditemukan."}\n\n'
+                return
+            if job['status'] == status:
+                yield ": keep-alive\n\n"
+                continue
+            status = job['status']
+            yield f"event: {status}\ndata: {json.dumps(job, default=float)}\n\n"
+            if status in ('done', 'error'):
+                return
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/batch_enhance', methods=['POST'])
+def batch_enhance():
+    """
+    Enhance banyak gambar sekaligus (beberapa file 'images' dan/atau
+    arsip .zip). Tanpa form 'params' memakai auto_enhance, dengan 'params'
+    (JSON) memakai parameter manual. Hasil dikirim sebagai NDJSON, satu
+    baris per gambar sesuai urutan selesai.
+    """
+    params = request.form.get('params')
+    try:
+        params = json.loads(params) if params else None
+    except ValueError:
+        return {'error': 'Parameter tidak valid.'}, 400
+
+    # Upload (terkompresi) sudah dibatasi MAX_CONTENT_LENGTH dan disalin ke
+    # memori; isi zip tidak diekstrak di sini. Hanya daftar member yang
+    # diperiksa terhadap batas, data dibaca satu per satu saat job dikirim.
+    inputs = []     # (nama, fungsi baca data)
+    uncompressed = 0
+    for file in request.files.getlist('images'):
+        if file.filename.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(io.BytesIO(file.read()))
+                members = [m for m in archive.infolist() if not m.is_dir() and allowed_file(m.filename)]
+            except zipfile.BadZipFile:
+                return {'error': f'Arsip zip tidak valid: {file.filename}'}, 400
+            # ZipExtFile berhenti di file_size, jadi total ini batas atas data yang dibaca
+            uncompressed += sum(m.file_size for m in members)
+            inputs.extend((m.filename, functools.partial(archive.read, m)) for m in members)
+        elif allowed_file(file.filename):
+            inputs.append((file.filename, lambda data=file.read(): data))
+        if len(inputs) > app.config['BATCH_MAX_FILES']:
+            return {'error': f"Terlalu banyak gambar (maks {app.config['BATCH_MAX_FILES']})."}, 413
+        if uncompressed > app.config['BATCH_MAX_UNCOMPRESSED_MB'] * 1024 * 1024:
+            return {'error': f"Isi arsip terlalu besar (maks {app.config['BATCH_MAX_UNCOMPRESSED_MB']} MB "
+                             "tak terkompresi)."}, 413
+
+    if not inputs:
+        return {'error': 'Tidak ada gambar yang didukung.'}, 400
+
+    # Kunci cache per job (path output unik), bukan per nama file: dua input
+    # bernama sama dengan isi berbeda tidak boleh berbagi kunci
+    keys = {}
+    cached = []
+
+    def pending_jobs():
+        """Baca input satu per satu; hasil dari cache dikumpulkan di cached"""
+        for name, read in inputs:
+            data = read()
+            result_filename = f"{uuid.uuid4().hex}_batch.jpg"
+            output_path = os.path.join(app.config['UPLOAD_FOLDER'], result_filename)
+            if result_cache is not None:
+                # File identik dengan parameter sama tidak diproses ulang
+                key = cache_key('batch', hashlib.sha256(data).hexdigest(), params)
+                hit = result_cache.get(key, '.jpg')
+                if hit is not None:
+                    cached.append({'source': name, 'filename': hit[0], 'params_used': hit[1]['params_used']})
+                    continue
+                keys[output_path] = key
+            yield name, output_path, params, data
+
+    def finish(result):
+        if 'output' in result:
+            output = result.pop('output')
+            key = keys.pop(output, None)
+            if key is not None:
+                result['filename'] = result_cache.adopt(key, '.jpg', output,
+                                                        {'params_used': result['params_used']})
+            else:
+                result['filename'] = os.path.basename(output)
+                # Setiap hasil batch berdiri sendiri, hanya dibatasi TTL/ukuran
+                result_store.register(result['filename'], result['filename'], 'batch')
+        return json.dumps(result, default=float) + "\n"
+
+    def generate():
+        for result in run_batch(pending_jobs()):
+            while cached:
+                yield json.dumps(cached.pop(0), default=float) + "\n"
+            yield finish(result)
+        while cached:
+            yield json.dumps(cached.pop(0), default=float) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/cache_stats')
+def cache_stats():
+    return {
+        'originals': image_cache.stats(),
+        'shared_originals': shared_originals.stats() if shared_originals is not None else None,
+        'stages': stage_cache.stats(),
+        'results': result_store.stats(),
+        'result_cache': result_cache.stats() if result_cache is not None else None,
+        'tables': table_cache_stats(),
+        'clahe': clahe_cache.stats(),
+        'render_slots': render_slots.stats() if render_slots is not None else None,
+        'jobs': job_queue.stats()
+    }
 
-    if img is None:
-        return {'error': 'Gambar tidak dapat dibaca. Pastikan format file didukung.'}, 400
-
-    remove_all_enhanced_images()
-
-    img = white_balance_grayworld(img,
-                                  float(data.get('r_gain', 1.0)),
-                                  float(data.get('g_gain', 1.0)),
-                                  float(data.get('b_gain', 1.0)))
-    img = denoise_bilateral(img, float(data.get('sigma_space', 3)), float(data.get('sigma_color', 60)))
-    img = gamma_correction(img, float(data.get('gamma', 1.0)))
-    img = enhance_contrast_clahe(img,
-                                  float(data.get('clip_limit', 2.0)),
-                                  int(data.get('tile_grid', 8)))
-    img = enhance_saturation(img, float(data.get('saturation', 1.0)))
-    img = unsharp_masking(img,
-                          radius=float(data.get('sharpen_radius', 1.0)),
-                          amount=float(data.get('sharpen_amount', 100)))
-
-    result_filename = save_image(img, suffix="manual")
-
-    return {'filename': result_filename}
+@app.route('/metrics')
+def metrics():
+    """Histogram latency (per proses) dalam format teks Prometheus"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/download/<filename>')
 def download_file(filename):
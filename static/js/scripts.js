@@ -1,5 +1,8 @@
 // Ensure filename is correctly passed from Flask/Jinja2 or set to null if not available
 const filename = document.body.dataset.filename || null;
+// Set by the server (ASYNC_JOBS_UI) only when /jobs polling is safe, i.e.
+// every request reaches the process that holds the job
+const asyncJobs = document.body.dataset.asyncJobs === "1";
 
 // DOM Elements
 const enhancedImg = document.getElementById("enhanced-img");
@@ -28,6 +31,12 @@ const defaultSliderValues = {
   gamma: "1.0",
 };
 
+// Sequence number so that a slow, older preview never overwrites a newer one
+let previewSequence = 0;
+
+// Object URL of the current inline preview (released when replaced)
+let previewObjectUrl = null;
+
 // Function to show loading state
 function showLoading() {
   if (loadingIndicator) loadingIndicator.style.display = "block";
@@ -49,6 +58,43 @@ function updateSlider(id, value) {
   }
 }
 
+// Poll an async job until it finishes; resolves with the job result
+function waitForJob(statusUrl, interval = 500) {
+  return fetch(statusUrl)
+    .then((res) => {
+      if (!res.ok) {
+        throw new Error(`HTTP error! status: ${res.status}`);
+      }
+      return res.json();
+    })
+    .then((job) => {
+      if (job.status === "done") return job.result;
+      if (job.status === "error") return { error: job.error };
+      return new Promise((resolve) => setTimeout(resolve, interval)).then(() =>
+        waitForJob(statusUrl, interval)
+      );
+    });
+}
+
+// Submit auto enhance as a server-side job and poll it, so long renders
+// (e.g. NLM denoising) do not hold a request worker
+function submitAutoEnhanceJob(body) {
+  return fetch("/jobs/auto_enhance", {
+    method: "POST",
+    headers: { "Content-Type": "application/x-www-form-urlencoded" },
+    body,
+  }).then((res) => {
+    if (res.status === 429) {
+      return { error: "Server sedang sibuk, coba lagi sebentar lagi." };
+    }
+    if (!res.ok) {
+      throw new Error(`HTTP error! status: ${res.status}`);
+    }
+    return res.json().then((job) => waitForJob(job.status_url));
+  });
+}
+
+// Auto enhance uses the synchronous route unless the server enables jobs
 function autoEnhance() {
   if (!filename) {
     console.error("No filename available for auto enhancement.");
@@ -56,20 +102,24 @@ function autoEnhance() {
     return;
   }
   showLoading();
-  fetch("/auto_enhance", {
-    method: "POST",
-    headers: { "Content-Type": "application/x-www-form-urlencoded" },
-    body: `filename=${filename}`,
-  })
-    .then((res) => {
-      if (!res.ok) {
-        throw new Error(`HTTP error! status: ${res.status}`);
-      }
-      return res.json();
-    })
+  previewSequence++; // Discard any in-flight manual preview
+  const body = `filename=${filename}&renditions=display`;
+  const request = asyncJobs
+    ? submitAutoEnhanceJob(body)
+    : fetch("/auto_enhance", {
+        method: "POST",
+        headers: { "Content-Type": "application/x-www-form-urlencoded" },
+        body,
+      }).then((res) => {
+        if (!res.ok) {
+          throw new Error(`HTTP error! status: ${res.status}`);
+        }
+        return res.json();
+      });
+  request
     .then((data) => {
       if (data.filename) {
-        showResult(data.filename);
+        showResult(data.filename, false, displaySource(data));
 
         // Jika ada params_used, update nilai slider/input
 
@@ -120,7 +170,8 @@ function autoEnhance() {
       } else {
         console.error("Auto enhance error:", data.error || "Unknown error");
         if (enhancedImgPlaceholderText)
-          enhancedImgPlaceholderText.textContent = "Error enhancing image.";
+          enhancedImgPlaceholderText.textContent =
+            data.error || "Error enhancing image.";
       }
     })
     .catch((error) => {
@@ -134,14 +185,19 @@ function autoEnhance() {
     });
 }
 
-function manualEnhance() {
+// preview = true renders a low-resolution proxy on the server (live feedback),
+// returned inline as WebP bytes without writing a file on the server;
+// preview = false renders the full-resolution result that can be downloaded.
+function manualEnhance(preview = false) {
   if (!filename) {
     console.error("No filename available for manual enhancement.");
     return;
   }
-  showLoading();
+  const sequence = ++previewSequence;
+  if (!preview) showLoading();
   const params = {
     filename,
+    preview,
     sigma_space: document.getElementById("sigma_space").value,
     sigma_color: document.getElementById("sigma_color").value,
     r_gain: document.getElementById("r_gain").value,
@@ -154,21 +210,33 @@ function manualEnhance() {
     sharpen_amount: document.getElementById("sharpen_amount").value,
     gamma: document.getElementById("gamma").value,
   };
+  if (preview) {
+    params.inline = true;
+    params.format = "webp";
+    params.quality = 80;
+  } else {
+    params.renditions = "display";
+  }
 
-  fetch("/manual_enhance", {
+  return fetch("/manual_enhance", {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify(params),
   })
     .then((res) => {
+      // 409: the server dropped this render because a newer one arrived
+      if (res.status === 409) return null;
       if (!res.ok) {
         throw new Error(`HTTP error! status: ${res.status}`);
       }
-      return res.json();
+      return preview ? res.blob() : res.json();
     })
     .then((data) => {
-      if (data.filename) {
-        showResult(data.filename);
+      if (data === null || sequence !== previewSequence) return; // A newer render is pending
+      if (preview) {
+        showPreviewImage(data);
+      } else if (data.filename) {
+        showResult(data.filename, data.preview, displaySource(data));
       } else {
         console.error("Manual enhance error:", data.error || "Unknown error");
         if (enhancedImgPlaceholderText)
@@ -182,12 +250,26 @@ function manualEnhance() {
           "Error: Could not connect to server.";
     })
     .finally(() => {
-      hideLoading();
+      if (!preview) hideLoading();
     });
 }
 
-function showResult(newFilename) {
-  const path = `/static/uploads/${newFilename}?t=${new Date().getTime()}`; // Cache buster
+function showPreviewImage(blob) {
+  if (previewObjectUrl) URL.revokeObjectURL(previewObjectUrl);
+  previewObjectUrl = URL.createObjectURL(blob);
+  showResult(null, true, previewObjectUrl);
+}
+
+// The editor pane shows the smaller display rendition; the full-size
+// result is only fetched when downloaded
+function displaySource(data) {
+  const display = (data.renditions || []).find((r) => r.name === "display");
+  return display ? `/static/uploads/${display.filename}` : null;
+}
+
+function showResult(newFilename, preview = false, src = null) {
+  const path =
+    src || `/static/uploads/${newFilename}?t=${new Date().getTime()}`; // Cache buster
   if (enhancedImg) {
     enhancedImg.src = path;
     enhancedImg.style.display = "block";
@@ -195,12 +277,13 @@ function showResult(newFilename) {
   if (enhancedImgPlaceholderText) {
     enhancedImgPlaceholderText.style.display = "none";
   }
+  // Previews are low resolution; only a full render can be downloaded
   if (downloadLink) {
-    downloadLink.href = `/download/${newFilename}`;
-    downloadLink.style.display = "inline-block";
+    downloadLink.href = preview ? "#" : `/download/${newFilename}`;
+    downloadLink.style.display = preview ? "none" : "inline-block";
   }
   if (downloadHint) {
-    downloadHint.style.display = "none";
+    downloadHint.style.display = preview ? "block" : "none";
   }
 }
 
@@ -229,6 +312,11 @@ function setupSliderListeners() {
       slider.addEventListener("input", () => {
         valueDisplay.textContent = slider.value;
       });
+      // Live low-resolution preview when the slider is released
+      slider.addEventListener("change", () => {
+        manualEnhance(true);
+        showImage("enhanced");
+      });
     }
   });
 }
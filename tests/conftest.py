@@ -0,0 +1,57 @@
+import importlib
+import io
+import os
+import re
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+# Test dijalankan dari root repo: python -m pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def noisy_image():
+    """Gambar BGR bertekstur dengan noise Gaussian berat (ukuran bisa diatur)"""
+    def make(height, width, sigma=30, seed=0):
+        rng = np.random.default_rng(seed)
+        yy, xx = np.mgrid[0:height, 0:width]
+        base = np.stack([(xx * 255 / max(1, width - 1)),
+                         (yy * 255 / max(1, height - 1)),
+                         128 + 100 * np.sin(xx / 7.0) * np.cos(yy / 5.0)], axis=-1)
+        noisy = base + rng.normal(0, sigma, base.shape)
+        return np.clip(noisy, 0, 255).astype(np.uint8)
+    return make
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """
+    Modul app.py dengan folder upload dan store bersama di direktori
+    sementara (UPLOAD_FOLDER relatif terhadap working directory).
+    """
+    root = tmp_path_factory.mktemp('app')
+    cwd = os.getcwd()
+    os.environ['SHARED_ORIGINALS_FOLDER'] = str(root / 'shared')
+    os.chdir(root)
+    try:
+        yield importlib.import_module('app')
+    finally:
+        os.chdir(cwd)
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+@pytest.fixture
+def uploaded(client):
+    """Upload satu gambar lewat /editor; kembalikan filename original"""
+    def upload(height=120, width=160):
+        rng = np.random.default_rng(0)
+        img = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 2)
+        data = cv2.imencode('.png', img)[1].tobytes()
+        response = client.post('/editor', data={'image': (io.BytesIO(data), 'x.png')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200
+        return re.search(r'data-filename="([^"]+)"', response.get_data(as_text=True)).group(1)
+    return upload
@@ -0,0 +1,180 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+from utils.analysis import (
+    ImageAnalysis,
+    analyze_brightness,
+    analyze_proxy,
+    analyze_dynamic_range,
+    estimate_noise,
+    has_color_cast,
+    is_blurry,
+    is_low_contrast,
+    needs_saturation_boost
+)
+from utils.bench import IMAGE_KINDS, synthetic_image
+from utils.enhance import auto_enhance
+from utils.tiles import analyze_tiled
+
+# Rumus acuan: versi float64 sebelum statistik dihitung tanpa salinan float
+
+def ref_noise(img):
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    blur = cv2.GaussianBlur(gray, (3, 3), 0)
+    return np.std(gray.astype(np.float32) - blur.astype(np.float32))
+
+def ref_contrast(img):
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return np.std(gray) / 255.0, np.sqrt(np.mean((gray - np.mean(gray)) ** 2)) / 255.0
+
+def ref_saturation(img):
+    s = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)[:, :, 1]
+    return np.mean(s), np.std(s), np.sum(s < 50) / s.size
+
+def ref_channel_means(img):
+    b, g, r = cv2.split(img)
+    return np.mean(r), np.mean(g), np.mean(b)
+
+def ref_laplacian_var(img):
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+def ref_mean_gradient(img):
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    grad_x = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
+    grad_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
+    return np.mean(np.sqrt(grad_x ** 2 + grad_y ** 2))
+
+def make_inputs():
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 256, (240, 320, 3), dtype=np.uint8)
+    flat = np.full((240, 320, 3), (90, 120, 150), np.uint8)
+    blurred = cv2.GaussianBlur(noise, (0, 0), 4)
+    dark_cast = (noise * np.array([0.3, 0.4, 0.8])).astype(np.uint8)
+    return {'random': noise, 'flat': flat, 'blurred': blurred, 'dark_cast': dark_cast}
+
+INPUTS = make_inputs()
+
+@pytest.fixture(params=sorted(INPUTS))
+def image(request):
+    return INPUTS[request.param]
+
+def test_noise_matches_baseline(image):
+    assert estimate_noise(image) == pytest.approx(ref_noise(image), rel=1e-5, abs=1e-6)
+
+def test_brightness_matches_baseline(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    assert analyze_brightness(image) == pytest.approx(np.mean(gray), rel=1e-9)
+
+def test_contrast_matches_baseline(image):
+    std_contrast, rms_contrast = ref_contrast(image)
+    result = is_low_contrast(image)
+    assert result['std_contrast'] == pytest.approx(std_contrast, rel=1e-6, abs=1e-9)
+    assert result['rms_contrast'] == pytest.approx(rms_contrast, rel=1e-6, abs=1e-9)
+
+def test_saturation_matches_baseline(image):
+    mean_sat, std_sat, low_ratio = ref_saturation(image)
+    result = needs_saturation_boost(image)
+    assert result['mean_sat'] == pytest.approx(mean_sat, rel=1e-9)
+    assert result['std_sat'] == pytest.approx(std_sat, rel=1e-6, abs=1e-9)
+    assert result['low_sat_ratio'] == pytest.approx(low_ratio, rel=1e-12)
+    assert result['needs_boost'] == (mean_sat < 60)
+
+def test_color_cast_matches_baseline(image):
+    means = ref_channel_means(image)
+    result = has_color_cast(image)
+    assert result['means'] == pytest.approx(means, rel=1e-9)
+    max_diff = max(abs(means[0] - means[1]), abs(means[1] - means[2]), abs(means[2] - means[0]))
+    assert result['has_cast'] == (max_diff > 15)
+
+def test_blur_matches_baseline(image):
+    result = is_blurry(image)
+    assert result['laplacian_var'] == pytest.approx(ref_laplacian_var(image), rel=1e-6, abs=1e-9)
+    assert result['mean_gradient'] == pytest.approx(ref_mean_gradient(image), rel=1e-5, abs=1e-6)
+    assert result['is_blurry'] == (ref_laplacian_var(image) < 100.0)
+
+def test_dynamic_range_unchanged(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    cdf = np.cumsum(hist / hist.sum())
+    result = analyze_dynamic_range(image)
+    assert result['low_5'] == np.searchsorted(cdf, 0.05)
+    assert result['high_95'] == np.searchsorted(cdf, 0.95)
+
+def test_measure_parallel_matches_serial(image):
+    serial = ImageAnalysis(image).measure()
+    with ThreadPoolExecutor(4) as pool:
+        parallel = ImageAnalysis(image).measure(pool)
+    assert repr(parallel) == repr(serial)
+
+# ================= ANALISIS PER STRIP =================
+
+@pytest.mark.parametrize('strip_height', [64, 100, 512])
+def test_analyze_tiled_matches_whole_frame(image, strip_height):
+    whole = ImageAnalysis(image)
+    tiled = analyze_tiled(image, strip_height=strip_height)
+    assert tiled.noise == pytest.approx(whole.noise, rel=1e-6, abs=1e-9)
+    assert tiled.laplacian_var == pytest.approx(whole.laplacian_var, rel=1e-6, abs=1e-9)
+    assert tiled.mean_gradient == pytest.approx(whole.mean_gradient, rel=1e-6, abs=1e-9)
+    assert tiled.brightness == pytest.approx(whole.brightness, rel=1e-9)
+    assert tiled.dynamic_range == whole.dynamic_range
+
+def test_analyze_tiled_large_image_uses_proxy_for_global_stats():
+    # long_edge kecil memaksa statistik global dari proxy yang diperkecil
+    img = cv2.resize(INPUTS['dark_cast'], (640, 480), interpolation=cv2.INTER_NEAREST)
+    whole = ImageAnalysis(img)
+    tiled = analyze_tiled(img, strip_height=96, long_edge=320)
+    assert tiled.noise == pytest.approx(whole.noise, rel=1e-6)
+    assert tiled.laplacian_var == pytest.approx(whole.laplacian_var, rel=1e-6)
+    assert tiled.mean_gradient == pytest.approx(whole.mean_gradient, rel=1e-6)
+    assert tiled.brightness == pytest.approx(whole.brightness, abs=1.0)
+    assert tiled.color_cast()['has_cast'] == whole.color_cast()['has_cast']
+
+# ================= ANALISIS PROXY =================
+
+def branches(analysis):
+    """Cabang auto_enhance yang dipilih dari sebuah analisis (threshold di enhance.py)"""
+    m = analysis.measure()
+    return {
+        'denoise': m['noise'] > 8,
+        'denoise_nlm': m['noise'] > 25,
+        'white_balance': m['color_cast']['has_cast'],
+        'contrast': bool(m['contrast']['is_low']),
+        'saturation': bool(m['saturation']['needs_boost']),
+        'sharpen': bool(m['blur']['is_blurry'])
+    }
+
+@pytest.mark.parametrize('kind', IMAGE_KINDS)
+def test_analyze_proxy_picks_same_branches(kind):
+    img = synthetic_image(kind, 1920, 1280)
+    whole, proxy = ImageAnalysis(img), analyze_proxy(img)
+    assert branches(proxy) == branches(whole)
+    assert proxy.brightness == pytest.approx(whole.brightness, abs=2.0)
+
+@pytest.mark.parametrize('kind', ['noisy', 'very_noisy', 'low_contrast', 'bright'])
+def test_analyze_proxy_auto_enhance_params_match(kind):
+    img = synthetic_image(kind, 1280, 960)
+    # Backend bilateral agar noise berat tidak menjalankan NLM penuh (lambat)
+    _, whole = auto_enhance(img, analysis=ImageAnalysis(img), denoise_backend='bilateral')
+    _, proxy = auto_enhance(img, analysis=analyze_proxy(img), denoise_backend='bilateral')
+    assert proxy.keys() == whole.keys()
+    assert proxy.get('gamma') == pytest.approx(whole.get('gamma'), abs=0.05)
+
+@pytest.mark.parametrize('height, width', [(700, 50), (900, 300), (641, 480), (200, 120)])
+def test_analyze_proxy_small_images(height, width):
+    # Lebih kecil dari grid * patch_size: patch dipotong ke ukuran gambar
+    img = synthetic_image('noisy', width, height)
+    proxy = analyze_proxy(img)
+    assert branches(proxy) == branches(ImageAnalysis(img))
+    assert np.isfinite(proxy.noise) and np.isfinite(proxy.laplacian_var)
+
+@pytest.mark.parametrize('convert', [cv2.COLOR_BGR2GRAY, cv2.COLOR_BGR2BGRA])
+def test_analyze_proxy_non_bgr_input(convert):
+    img = cv2.cvtColor(synthetic_image('noisy', 1280, 960), convert)
+    proxy = analyze_proxy(img)
+    assert branches(proxy) == branches(ImageAnalysis(img))
+    if img.ndim == 2:
+        np.testing.assert_array_equal(analyze_proxy(img[:, :, None]).hist, proxy.hist)
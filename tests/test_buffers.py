@@ -0,0 +1,25 @@
+import numpy as np
+
+from utils.buffers import BufferPool
+
+def test_same_key_reuses_buffer():
+    pool = BufferPool()
+    assert pool.get('a', (4, 4, 3)) is pool.get('a', (4, 4, 3))
+    assert pool.get('a', (4, 4, 3)) is not pool.get('a', (4, 5, 3))
+
+def test_nbytes_bounded_after_many_large_shapes():
+    mb = 1024 * 1024
+    pool = BufferPool(max_bytes=8 * mb, max_buffer_bytes=4 * mb)
+    for height in range(600, 1400, 50):
+        for name in ('lab', 'plane', 'float'):
+            dtype = np.float32 if name == 'float' else np.uint8
+            shape = (height, 1000) if name == 'plane' else (height, 1000, 3)
+            pool.get(name, shape, dtype)
+            assert pool.nbytes() <= 8 * mb
+
+def test_large_buffer_not_pooled():
+    pool = BufferPool(max_buffer_bytes=1024)
+    big = pool.get('lab', (64, 64, 3))
+    assert big.shape == (64, 64, 3)
+    assert pool.get('lab', (64, 64, 3)) is not big
+    assert pool.nbytes() == 0
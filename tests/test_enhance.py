@@ -0,0 +1,37 @@
+import numpy as np
+
+from utils import enhance
+from utils.enhance import auto_enhance, choose_denoise_backend
+from utils.tiles import StripRunner
+
+# ================= BACKEND DENOISE =================
+
+def test_given_backend_overrides_budget(noisy_image):
+    img = noisy_image(96, 128, sigma=80)
+    _, params_used = auto_enhance(img, denoise_budget_ms=1e9, denoise_backend='nlm_half')
+    assert params_used['denoise_backend'] == 'nlm_half'
+
+def test_budget_picks_faster_backend():
+    assert choose_denoise_backend(48e6, None) == 'nlm'
+    assert choose_denoise_backend(48e6, 1e-3) == 'bilateral'
+
+def test_cost_recorded_once_per_stage_with_frame_pixels(noisy_image, monkeypatch):
+    calls = []
+    monkeypatch.setattr(enhance, 'record_denoise_cost', lambda *args: calls.append(args))
+    img = noisy_image(160, 128, sigma=80)
+    auto_enhance(img, runner=StripRunner(64), denoise_backend='nlm_half')
+    assert [(backend, pixels) for backend, pixels, _ in calls] == [('nlm_half', 160 * 128)]
+
+def test_preview_proxy_does_not_record_cost(noisy_image, monkeypatch):
+    calls = []
+    monkeypatch.setattr(enhance, 'record_denoise_cost', lambda *args: calls.append(args))
+    img = noisy_image(96, 128, sigma=80)
+    auto_enhance(img, analysis=enhance.ImageAnalysis(img), spatial_scale=0.5, denoise_backend='nlm_half')
+    assert calls == []
+
+def test_strips_match_whole_frame_with_fixed_backend(noisy_image):
+    img = noisy_image(160, 128, sigma=80)
+    whole, params = auto_enhance(img, denoise_backend='nlm_half')
+    strips, strip_params = auto_enhance(img, runner=StripRunner(64), denoise_backend='nlm_half')
+    assert strip_params == params
+    assert np.abs(whole.astype(int) - strips).max() <= 1
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+
+import pytest
+
+from utils.jobs import JobQueue, QueueFull
+
+def wait_for(client, status_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(status_url).get_json()
+        if job['status'] in ('done', 'error'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("job tidak selesai")
+
+# ================= ROUTE /jobs =================
+
+def test_submit_and_poll(client, app_module, uploaded):
+    filename = uploaded()
+    response = client.post('/jobs/manual_enhance', json={'filename': filename, 'gamma': 1.3})
+    assert response.status_code == 202
+    body = response.get_json()
+    job = wait_for(client, body['status_url'])
+    assert job['status'] == 'done'
+    assert job['result']['filename'].endswith('.jpg')
+    assert os.path.isfile(os.path.join(app_module.UPLOAD_FOLDER, job['result']['filename']))
+
+def test_failed_job_reports_error(client):
+    body = client.post('/jobs/auto_enhance', data={'filename': 'tidak_ada_original.jpg'}).get_json()
+    job = wait_for(client, body['status_url'])
+    assert job['status'] == 'error'
+    assert job['error']
+
+def test_queue_full_returns_429(client, app_module, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(app_module, 'job_queue', JobQueue(workers=1, max_pending=1))
+    monkeypatch.setattr(app_module, 'enhance_auto', lambda values: release.wait(10) and {'filename': 'x'})
+    try:
+        first = client.post('/jobs/auto_enhance', data={'filename': 'a'})
+        # Tunggu job pertama berjalan agar job kedua benar-benar menunggu di antrian
+        while client.get(first.get_json()['status_url']).get_json()['status'] != 'running':
+            time.sleep(0.01)
+        second = client.post('/jobs/auto_enhance', data={'filename': 'b'})
+        third = client.post('/jobs/auto_enhance', data={'filename': 'c'})
+        assert (first.status_code, second.status_code, third.status_code) == (202, 202, 429)
+        assert third.headers['Retry-After'] == str(app_module.app.config['JOB_RETRY_AFTER'])
+        assert client.get(second.get_json()['status_url']).get_json()['position'] == 0
+    finally:
+        release.set()
+    assert wait_for(client, second.get_json()['status_url'])['status'] == 'done'
+
+def test_unknown_job_returns_404(client):
+    assert client.get('/jobs/tidak-ada').status_code == 404
+    events = client.get('/jobs/tidak-ada/events').get_data(as_text=True)
+    assert events.startswith('event: error')
+
+def test_events_stream_until_done(client, uploaded):
+    filename = uploaded()
+    body = client.post('/jobs/manual_enhance', json={'filename': filename}).get_json()
+    events = client.get(body['events_url']).get_data(as_text=True)
+    names = [line.split(': ', 1)[1] for line in events.splitlines() if line.startswith('event: ')]
+    assert names[-1] == 'done'
+
+# ================= JobQueue =================
+
+def test_finished_jobs_expire_after_ttl():
+    queue = JobQueue(workers=1, ttl_seconds=0)
+    job_id = queue.submit(lambda: 1)
+    assert queue.wait(job_id, 'queued', timeout=5)['status'] in ('running', 'done')
+    while queue.get(job_id)['status'] != 'done':
+        time.sleep(0.01)
+    time.sleep(0.01)
+    queue.submit(lambda: 2)     # submit membersihkan job yang kedaluwarsa
+    assert queue.get(job_id) is None
+
+def test_submit_rejects_when_full():
+    release = threading.Event()
+    queue = JobQueue(workers=1, max_pending=0)
+    with pytest.raises(QueueFull):
+        queue.submit(release.wait)
+    assert queue.stats()['rejected'] == 1
@@ -0,0 +1,119 @@
+import cv2
+import numpy as np
+import pytest
+
+from utils.enhance import (
+    denoise_bilateral,
+    enhance_contrast_clahe,
+    enhance_saturation,
+    gamma_correction,
+    unsharp_masking,
+    white_balance_grayworld
+)
+from utils.image_cache import ImageCache
+from utils.pipeline import (
+    MANUAL_STAGES,
+    parse_manual_params,
+    plan_manual_stages,
+    run_manual_pipeline,
+    stage_keys
+)
+from utils.tiles import StripRunner
+
+# Batas ΔE (CIE76) fuse_color terhadap mode default pada saturasi 1.0:
+# selisihnya hanya dari round trip HSV yang hilang
+MAX_MEAN_DELTA_E = 1.0
+MAX_DELTA_E = 3.0
+
+def reference_chain(img, p):
+    """Rantai per stage sebelum perencanaan stage (tanpa LUT gabungan atau buffer LAB)"""
+    img = white_balance_grayworld(img, p['r_gain'], p['g_gain'], p['b_gain'])
+    img = denoise_bilateral(img, p['sigma_space'], p['sigma_color'])
+    img = gamma_correction(img, p['gamma'])
+    img = enhance_contrast_clahe(img, p['clip_limit'], p['tile_grid'])
+    img = enhance_saturation(img, p['saturation'])
+    return unsharp_masking(img, radius=p['sharpen_radius'], amount=p['sharpen_amount'])
+
+def delta_e(a, b):
+    lab_a = cv2.cvtColor(a.astype(np.float32) / 255, cv2.COLOR_BGR2LAB)
+    lab_b = cv2.cvtColor(b.astype(np.float32) / 255, cv2.COLOR_BGR2LAB)
+    return np.sqrt(((lab_a - lab_b) ** 2).sum(axis=-1))
+
+@pytest.fixture(scope='module')
+def image():
+    rng = np.random.default_rng(0)
+    return cv2.GaussianBlur(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8), (0, 0), 2)
+
+PARAM_SETS = [
+    {},
+    {'r_gain': 1.1, 'b_gain': 0.9, 'gamma': 0.8, 'saturation': 1.3},
+    # Denoise nonaktif: white balance dan gamma digabung menjadi satu LUT
+    {'sigma_space': 0, 'sigma_color': 0, 'r_gain': 1.2, 'gamma': 1.4, 'clip_limit': 3.0, 'tile_grid': 6},
+    {'clip_limit': 0, 'saturation': 0.7, 'sharpen_radius': 0, 'sharpen_amount': 0}
+]
+
+@pytest.mark.parametrize('values', PARAM_SETS)
+def test_default_mode_matches_per_stage_chain(image, values):
+    params = parse_manual_params(values)
+    np.testing.assert_array_equal(run_manual_pipeline(image, params), reference_chain(image, params))
+
+def test_point_stages_are_fused(image):
+    params = parse_manual_params({'sigma_space': 0, 'sigma_color': 0})
+    assert plan_manual_stages(params)[0].name == 'white_balance+gamma'
+
+def test_fuse_color_within_delta_e_at_unit_saturation(image):
+    params = parse_manual_params({'saturation': 1.0, 'clip_limit': 2.0})
+    plain = run_manual_pipeline(image, params)
+    fused = run_manual_pipeline(image, params, fuse_color=True)
+    diff = delta_e(plain, fused)
+    assert diff.mean() < MAX_MEAN_DELTA_E
+    assert diff.max() < MAX_DELTA_E
+
+@pytest.mark.parametrize('fuse_color', [False, True])
+@pytest.mark.parametrize('values', PARAM_SETS)
+def test_cached_uncached_and_strips_agree(image, values, fuse_color):
+    params = parse_manual_params(values)
+    uncached = run_manual_pipeline(image, params, fuse_color=fuse_color)
+    cached = run_manual_pipeline(image, params, image_key='img', cache=ImageCache(), fuse_color=fuse_color)
+    strips = run_manual_pipeline(image, params, runner=StripRunner(64), fuse_color=fuse_color)
+    np.testing.assert_array_equal(cached, uncached)
+    np.testing.assert_array_equal(strips, uncached)
+
+@pytest.mark.parametrize('fuse_color', [False, True])
+def test_resume_from_stage_cache(image, fuse_color):
+    cache = ImageCache()
+    first = parse_manual_params({'saturation': 1.2})
+    run_manual_pipeline(image, first, image_key='img', cache=cache, fuse_color=fuse_color)
+
+    # Hanya saturasi yang berubah: dilanjutkan dari stage cache
+    second = dict(first, saturation=1.5)
+    resumed = run_manual_pipeline(image, second, image_key='img', cache=cache, fuse_color=fuse_color)
+    np.testing.assert_array_equal(resumed, run_manual_pipeline(image, second, fuse_color=fuse_color))
+
+    # Parameter pertama lagi: seluruhnya dari cache
+    again = run_manual_pipeline(image, first, image_key='img', cache=cache, fuse_color=fuse_color)
+    np.testing.assert_array_equal(again, run_manual_pipeline(image, first, fuse_color=fuse_color))
+
+def test_resume_skips_cached_stage_inside_lab_group(image):
+    # Hasil contrast (BGR) dengan kunci fuse_color ada di cache. Melanjutkan
+    # dari sana berarti saturasi dijalankan lewat HSV, jadi planner harus
+    # mengulang seluruh grup LAB dari stage sebelumnya.
+    cache = ImageCache()
+    params = parse_manual_params({'saturation': 1.4})
+    before_contrast = gamma_correction(denoise_bilateral(
+        white_balance_grayworld(image, params['r_gain'], params['g_gain'], params['b_gain']),
+        params['sigma_space'], params['sigma_color']), params['gamma'])
+    contrast = enhance_contrast_clahe(before_contrast, params['clip_limit'], params['tile_grid'])
+    index = [stage.name for stage in MANUAL_STAGES].index('contrast')
+    cache.put(stage_keys('img', params, fuse_color=True)[index], contrast)
+
+    resumed = run_manual_pipeline(image, params, image_key='img', cache=cache, fuse_color=True)
+    np.testing.assert_array_equal(resumed, run_manual_pipeline(image, params, fuse_color=True))
+
+def test_fused_and_default_results_cached_separately(image):
+    cache = ImageCache()
+    params = parse_manual_params({'saturation': 1.3})
+    plain = run_manual_pipeline(image, params, image_key='img', cache=cache)
+    fused = run_manual_pipeline(image, params, image_key='img', cache=cache, fuse_color=True)
+    np.testing.assert_array_equal(plain, run_manual_pipeline(image, params))
+    np.testing.assert_array_equal(fused, run_manual_pipeline(image, params, fuse_color=True))
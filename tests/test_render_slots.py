@@ -0,0 +1,98 @@
+import threading
+import time
+
+from utils.render_slots import RenderSlots, Superseded
+
+def wait_until_waiting(slots, timeout=5):
+    """Tunggu sampai ada request yang menunggu slot"""
+    deadline = time.monotonic() + timeout
+    while slots.stats()['waiting'] == 0:
+        assert time.monotonic() < deadline, "tidak ada request yang menunggu"
+        time.sleep(0.001)
+
+def test_newer_render_supersedes_running_one():
+    slots = RenderSlots()
+    started, newer_done = threading.Event(), threading.Event()
+    outcome = {}
+
+    def older():
+        try:
+            with slots.slot('img') as check:
+                started.set()
+                newer_done.wait(5)   # stage berikutnya baru dicek setelah request baru masuk
+                check()
+            outcome['older'] = 'completed'
+        except Superseded:
+            outcome['older'] = 'superseded'
+
+    thread = threading.Thread(target=older)
+    thread.start()
+    started.wait(5)
+    result = {}
+
+    def newer():
+        with slots.slot('img') as check:
+            check()
+            result['newer'] = 'completed'
+
+    newer_thread = threading.Thread(target=newer)
+    newer_thread.start()
+    # Request baru menaikkan generasi lalu menunggu slot yang dipegang render lama
+    wait_until_waiting(slots)
+    newer_done.set()
+    thread.join(5)
+    newer_thread.join(5)
+    assert outcome == {'older': 'superseded'}
+    assert result == {'newer': 'completed'}
+    assert slots.stats()['superseded_running'] == 1
+
+def test_waiting_render_superseded_before_start():
+    slots = RenderSlots()
+    holding, release = threading.Event(), threading.Event()
+    outcome = []
+
+    def hold():
+        with slots.slot('img'):
+            holding.set()
+            release.wait(5)
+
+    def waiter():
+        try:
+            with slots.slot('img'):
+                outcome.append('ran')
+        except Superseded:
+            outcome.append('superseded')
+
+    first = threading.Thread(target=hold)
+    first.start()
+    holding.wait(5)
+    second = threading.Thread(target=waiter)
+    second.start()
+    wait_until_waiting(slots)
+    third = threading.Thread(target=waiter)
+    third.start()
+    second.join(5)
+    release.set()
+    first.join(5)
+    third.join(5)
+    # Yang menunggu lebih dulu mundur tanpa berjalan, yang terbaru berjalan
+    assert outcome == ['superseded', 'ran']
+    assert slots.stats()['superseded_queued'] == 1
+
+def test_completed_render_does_not_block_next():
+    slots = RenderSlots()
+    with slots.slot('img') as check:
+        check()
+    with slots.slot('img') as check:
+        check()
+    stats = slots.stats()
+    assert stats['completed'] == 2
+    assert stats['active'] == stats['waiting'] == 0
+
+def test_different_keys_do_not_supersede():
+    slots = RenderSlots()
+    with slots.slot('a') as check_a:
+        with slots.slot('b') as check_b:
+            check_b()
+        check_a()
+    assert slots.stats()['completed'] == 2
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from utils.renditions import (Rendition, encode_image, is_downscaled, parse_rendition_names,
+                              render_renditions)
+
+def spec(name, long_edge):
+    return Rendition(name, long_edge, 'jpeg', 80, False)
+
+@pytest.mark.parametrize('long_edge, shape, expected', [
+    (None, (480, 640, 3), False),      # full
+    (1280, (480, 640, 3), False),      # display dari proxy preview
+    (640, (480, 640, 3), False),       # sama dengan sisi terpanjang
+    (320, (480, 640, 3), True),
+    (1280, (1080, 1920, 3), True),
+    (1280, (1920, 1080, 3), True)      # potret: sisi terpanjang adalah tinggi
+])
+def test_is_downscaled(long_edge, shape, expected):
+    assert is_downscaled(spec('display', long_edge), shape) == expected
+
+def test_render_renditions_sizes():
+    img = np.zeros((480, 640, 3), np.uint8)
+    specs = [spec('full', None), spec('display', 400), spec('thumbnail', 160)]
+    rendered = render_renditions(img, specs)
+    assert [(s.name, size) for s, _, size in rendered] == [
+        ('full', (480, 640)), ('display', (300, 400)), ('thumbnail', (120, 160))]
+    assert rendered[0][1].tobytes() == encode_image(img, 'jpeg', 80).tobytes()
+
+def test_parse_rendition_names_order_and_full():
+    assert parse_rendition_names('thumbnail, full,display') == ('display', 'thumbnail')
+    with pytest.raises(ValueError):
+        parse_rendition_names('poster')
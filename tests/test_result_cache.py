@@ -0,0 +1,74 @@
+import os
+import threading
+
+from utils.result_cache import ResultCache
+
+def entry_files(folder):
+    return sorted(name for name in os.listdir(folder) if '_cached' in name)
+
+def test_miss_then_hit(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    assert cache.get('a', '.jpg') is None
+    filename = cache.put('a', '.jpg', b'pixels', {'params_used': {'gamma': 1.2}})
+    assert cache.get('a', '.jpg') == (filename, {'params_used': {'gamma': 1.2}})
+    assert cache.get('a', '.jpg', read=True) == (filename, {'params_used': {'gamma': 1.2}}, b'pixels')
+    assert (cache.hits, cache.misses) == (2, 1)
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=250, min_age=0)
+    for i, key in enumerate('abc'):
+        cache.put(key, '.jpg', b'x' * 100)
+        os.utime(tmp_path / cache.filename(key, '.jpg'), (i, i))
+    cache.put('d', '.jpg', b'x' * 100)
+    assert cache.get('a', '.jpg') is None
+    assert cache.get('b', '.jpg') is None
+    assert cache.get('c', '.jpg') is not None
+    assert cache.evictions == 2
+
+def test_budget_shared_between_workers(tmp_path):
+    # Dua instance (seperti dua worker gunicorn) berbagi satu batas
+    first = ResultCache(str(tmp_path), max_bytes=250, min_age=0)
+    second = ResultCache(str(tmp_path), max_bytes=250, min_age=0)
+    first.put('a', '.jpg', b'x' * 100)
+    os.utime(tmp_path / first.filename('a', '.jpg'), (0, 0))
+    second.put('b', '.jpg', b'x' * 100)
+    second.put('c', '.jpg', b'x' * 100)
+    assert first.get('a', '.jpg') is None
+    assert second.stats()['bytes'] <= 250
+
+def test_recently_used_entries_not_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=150, min_age=60)
+    cache.put('a', '.jpg', b'x' * 100)
+    cache.put('b', '.jpg', b'x' * 100)
+    assert cache.get('a', '.jpg') is not None
+
+def test_read_after_evict_is_miss(tmp_path):
+    reader = ResultCache(str(tmp_path))
+    evicter = ResultCache(str(tmp_path), max_bytes=0, min_age=0)
+    reader.put('a', '.jpg', b'pixels')
+    evicter.put('b', '.jpg', b'other')
+    assert reader.get('a', '.jpg', read=True) is None
+
+def test_concurrent_read_and_evict(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=300, min_age=0)
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        try:
+            while not stop.is_set():
+                hit = cache.get('k0', '.jpg', read=True)
+                assert hit is None or hit[2] == b'x' * 100
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for i in range(200):
+        cache.put(f"k{i % 7}", '.jpg', b'x' * 100)
+    stop.set()
+    for thread in readers:
+        thread.join()
+    assert not errors
+    assert not [name for name in entry_files(tmp_path) if name.endswith('.tmp')]
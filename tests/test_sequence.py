@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import pytest
+
+from utils.pipeline import MANUAL_DEFAULTS
+from utils.sequence import (MIN_CLIP_LIMIT, MIN_SHARPEN_AMOUNT, MIN_SIGMA_COLOR, SMOOTHED_PARAMS,
+                            ParamSmoother, enhance_sequence, keyframe_params)
+
+def target(**values):
+    """Parameter keyframe: stage netral kecuali yang diisi"""
+    return {**SMOOTHED_PARAMS, 'tile_grid': None, **values}
+
+CLAHE_ON = target(clip_limit=2.0, tile_grid=6, sharpen_radius=1.5, sharpen_amount=40.0)
+CLAHE_OFF = target(sigma_space=12.0, sigma_color=12.0)
+
+def test_alternating_keyframes_smoothed_with_cutoffs():
+    smoother = ParamSmoother(alpha=0.25)
+    outputs = [smoother.update(t) for t in (CLAHE_OFF, CLAHE_ON, CLAHE_OFF, CLAHE_ON)]
+
+    # EMA: state += alpha * (target - state); 0.375 < MIN_CLIP_LIMIT dipotong
+    assert smoother.state['clip_limit'] == pytest.approx(0.78125)
+    assert [p['clip_limit'] for p in outputs] == pytest.approx([0.0, 0.5, 0.0, 0.78125])
+    assert [p['sharpen_amount'] for p in outputs] == pytest.approx([0.0, 10.0, 0.0, 15.625])
+    # sigma_color 12 -> 9 -> 6.75 -> 5.06: di bawah MIN_SIGMA_COLOR bilateral dimatikan
+    assert [p['sigma_color'] for p in outputs] == pytest.approx([12.0, 0.0, 0.0, 0.0])
+    assert [p['sigma_space'] for p in outputs] == pytest.approx([12.0, 0.0, 0.0, 0.0])
+    # tile_grid tidak dihaluskan: nilai keyframe terakhir yang menjalankan CLAHE
+    assert [p['tile_grid'] for p in outputs] == [MANUAL_DEFAULTS['tile_grid'], 6, 6, 6]
+
+def test_cutoffs_turn_faded_stages_off():
+    smoother = ParamSmoother(alpha=1.0)
+    params = smoother.update(target(clip_limit=MIN_CLIP_LIMIT / 2, sigma_space=5.0,
+                                    sigma_color=MIN_SIGMA_COLOR / 2, sharpen_radius=1.0,
+                                    sharpen_amount=MIN_SHARPEN_AMOUNT / 2))
+    assert params['clip_limit'] == 0.0
+    assert params['sigma_space'] == params['sigma_color'] == 0.0
+    assert params['sharpen_radius'] == params['sharpen_amount'] == 0.0
+
+def test_keyframe_params_complete():
+    rng = np.random.default_rng(0)
+    frame = cv2.GaussianBlur(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8), (0, 0), 3)
+    params = keyframe_params(frame)
+    assert set(params) == set(SMOOTHED_PARAMS) | {'tile_grid'}
+
+def test_enhance_sequence_image_pattern(tmp_path):
+    rng = np.random.default_rng(0)
+    for i in range(7):
+        frame = np.clip(rng.normal(100 + 10 * i, 20, (48, 64, 3)), 0, 255).astype(np.uint8)
+        cv2.imwrite(str(tmp_path / f"in_{i:04d}.png"), frame)
+
+    summary = enhance_sequence(str(tmp_path / "in_%04d.png"), str(tmp_path / "out_%04d.png"),
+                               keyframe_interval=3)
+    assert summary['frames'] == 7
+    assert summary['keyframes'] == 3     # frame 0, 3, 6
+    written = sorted(path.name for path in tmp_path.glob("out_*.png"))
+    assert written == [f"out_{i:04d}.png" for i in range(7)]
+    assert cv2.imread(str(tmp_path / "out_0006.png")).shape == (48, 64, 3)
@@ -0,0 +1,33 @@
+import errno
+import os
+
+import numpy as np
+import pytest
+
+from utils import shared_store
+from utils.shared_store import SharedImageStore
+
+pytestmark = pytest.mark.skipif(not shared_store.available(), reason="butuh fcntl")
+
+def test_put_and_get_roundtrip(tmp_path):
+    store = SharedImageStore(str(tmp_path))
+    img = np.arange(60, dtype=np.uint8).reshape(4, 5, 3)
+    np.testing.assert_array_equal(store.put('a', img), img)
+    np.testing.assert_array_equal(store.get('a'), img)
+
+def test_max_bytes_capped_by_filesystem_size(tmp_path):
+    store = SharedImageStore(str(tmp_path), max_bytes=1 << 60)
+    assert store.max_bytes < 1 << 60
+
+def test_put_returns_none_when_disk_full(tmp_path, monkeypatch):
+    store = SharedImageStore(str(tmp_path))
+
+    def no_space(f, img):
+        f.write(b'partial')
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(shared_store.np, 'save', no_space)
+    assert store.put('a', np.zeros((4, 4, 3), np.uint8)) is None
+    # File .tmp setengah jadi dihapus dan entri tidak masuk indeks
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+    assert store.get('a') is None
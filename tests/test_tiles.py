@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from utils.enhance import adaptive_denoise_nlm, nlm_halo
+from utils.tiles import StripRunner, run_direct, split_strip_height
+
+# ================= DENOISE NLM SETENGAH RESOLUSI =================
+
+@pytest.mark.parametrize('height, width', [(96, 80), (97, 80), (96, 81), (97, 81)])
+def test_nlm_half_strips_match_whole_frame(noisy_image, height, width):
+    img = noisy_image(height, width)
+    halo = nlm_halo(1.0, 'nlm_half')
+    expected, _ = run_direct(adaptive_denoise_nlm, img, halo, 30, 1.0, 'nlm_half')
+    result, _ = StripRunner(32)(adaptive_denoise_nlm, img, halo, 30, 1.0, 'nlm_half')
+    assert result.shape == img.shape
+    np.testing.assert_array_equal(result, expected)
+
+def test_nlm_half_writes_dst_for_odd_size(noisy_image):
+    img = noisy_image(41, 33)
+    dst = np.empty_like(img)
+    result, _ = adaptive_denoise_nlm(img, 30, 1.0, 'nlm_half', dst=dst)
+    assert result is dst
+    np.testing.assert_array_equal(dst, adaptive_denoise_nlm(img, 30, 1.0, 'nlm_half')[0])
+
+# ================= TINGGI STRIP =================
+
+@pytest.mark.parametrize('threads', [3, 4, 6, 8])
+def test_split_strip_height_is_even(threads):
+    for height in (427, 428, 480, 641):
+        strip_height = split_strip_height(height, threads)
+        assert strip_height % 2 == 0
+        assert strip_height * threads >= height
+
+@pytest.mark.parametrize('height', [427, 428])
+@pytest.mark.parametrize('strip_height', [107, 143])
+def test_odd_strip_height_matches_whole_frame(noisy_image, height, strip_height):
+    # Proxy preview foto 3:2 (640 x 427/428) dengan tinggi strip ganjil
+    img = noisy_image(height, 640, seed=1)
+    halo = nlm_halo(1.0, 'nlm_half')
+    expected, _ = run_direct(adaptive_denoise_nlm, img, halo, 30, 1.0, 'nlm_half')
+    result, _ = StripRunner(strip_height)(adaptive_denoise_nlm, img, halo, 30, 1.0, 'nlm_half')
+    np.testing.assert_array_equal(result, expected)
+
+@pytest.mark.parametrize('threads', [3, 4, 6, 8])
+def test_preview_strips_match_whole_frame(noisy_image, threads):
+    img = noisy_image(427, 640, seed=2)
+    halo = nlm_halo(1.0, 'nlm_half')
+    expected, _ = run_direct(adaptive_denoise_nlm, img, halo, 30, 1.0, 'nlm_half')
+    runner = StripRunner(split_strip_height(img.shape[0], threads, minimum=1))
+    result, _ = runner(adaptive_denoise_nlm, img, halo, 30, 1.0, 'nlm_half')
+    np.testing.assert_array_equal(result, expected)
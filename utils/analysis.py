@@ -1,124 +1,353 @@
 import cv2
 import numpy as np
+from contextvars import copy_context
+from functools import cached_property
+
+from utils.metrics import timed
+
+# ================= ANALYSIS ENGINE =================
+
+def as_color(img):
+    """Gambar grayscale (2D atau 1 kanal) menjadi BGR; BGR/BGRA dikembalikan apa adanya"""
+    if img.ndim == 2 or img.shape[2] == 1:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    return img
+
+class ImageAnalysis:
+    """
+    Analisis gambar dalam satu lintasan.
+
+    Grayscale, HSV, histogram, CDF, dan rata-rata kanal dihitung sekali
+    (lazy) lalu dipakai bersama oleh semua metrik, sehingga auto_enhance
+    tidak lagi mengulang cvtColor / calcHist / split untuk setiap fungsi.
+    """
+
+    def __init__(self, img):
+        self.img = as_color(img)
+
+    # ---------- Data dasar (dihitung sekali) ----------
+
+    @cached_property
+    def gray(self):
+        return cv2.cvtColor(self.img, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def hsv(self):
+        return cv2.cvtColor(self.img, cv2.COLOR_BGR2HSV)
+
+    @cached_property
+    def hist(self):
+        return cv2.calcHist([self.gray], [0], None, [256], [0, 256]).ravel()
+
+    @cached_property
+    def cdf(self):
+        hist_norm = self.hist / self.hist.sum()
+        return np.cumsum(hist_norm)
+
+    @cached_property
+    def gray_stats(self):
+        """(mean, std) grayscale dalam satu lintasan, akumulasi double tanpa salinan float"""
+        mean, std = cv2.meanStdDev(self.gray)
+        return mean[0, 0], std[0, 0]
+
+    @cached_property
+    def channel_means(self):
+        """Rata-rata kanal dalam urutan (r, g, b)"""
+        b, g, r, _ = cv2.mean(self.img)
+        return r, g, b
+
+    def percentile(self, q):
+        """Level intensitas pada fraksi kumulatif q (0-1)"""
+        return np.searchsorted(self.cdf, q)
+
+    # ---------- Metrik ----------
+
+    @cached_property
+    def noise(self):
+        blur = cv2.GaussianBlur(self.gray, (3, 3), 0)
+        # Selisih uint8 muat di int16; std dihitung tanpa array float
+        noise = cv2.subtract(self.gray, blur, dtype=cv2.CV_16S)
+        return cv2.meanStdDev(noise)[1][0, 0]
+
+    @cached_property
+    def brightness(self):
+        return self.gray_stats[0]
+
+    @cached_property
+    def dynamic_range(self):
+        low_1 = self.percentile(0.01)
+        high_99 = self.percentile(0.99)
+        low_5 = self.percentile(0.05)
+        high_95 = self.percentile(0.95)
+
+        return {
+            'range_99': high_99 - low_1,
+            'range_95': high_95 - low_5,
+            'low_1': low_1,
+            'high_99': high_99,
+            'low_5': low_5,
+            'high_95': high_95
+        }
+
+    def color_cast(self, threshold=15):
+        mean_r, mean_g, mean_b = self.channel_means
+
+        max_diff = max(abs(mean_r - mean_g), abs(mean_g - mean_b), abs(mean_b - mean_r))
+        severity = max_diff / 255.0  # Normalisasi ke 0-1
+
+        return {
+            'has_cast': max_diff > threshold,
+            'severity': severity,
+            'means': (mean_r, mean_g, mean_b)
+        }
+
+    def contrast(self, threshold=0.25):
+        # Metode 1: Range-based contrast
+        low = self.percentile(0.01)
+        high = self.percentile(0.99)
+        contrast_ratio = (high - low) / 255.0
+
+        # Metode 2: Standard deviation contrast
+        std_contrast = self.gray_stats[1] / 255.0
+
+        # Metode 3: RMS contrast (deviasi terhadap mean, sama dengan std populasi)
+        rms_contrast = std_contrast
+
+        return {
+            'is_low': contrast_ratio < threshold,
+            'range_contrast': contrast_ratio,
+            'std_contrast': std_contrast,
+            'rms_contrast': rms_contrast
+        }
+
+    @cached_property
+    def saturation_stats(self):
+        """(mean, std, rasio pixel saturasi < 50) kanal S"""
+        return saturation_stats(self.hsv)
+
+    def saturation(self, threshold=60):
+        mean_saturation, std_saturation, low_sat_pixels = self.saturation_stats
+
+        return {
+            'needs_boost': mean_saturation < threshold,
+            'mean_sat': mean_saturation,
+            'std_sat': std_saturation,
+            'low_sat_ratio': low_sat_pixels
+        }
+
+    @cached_property
+    def laplacian_var(self):
+        """Variance of Laplacian (nilai Laplacian uint8 muat di int16, hasil eksak)"""
+        lap = cv2.Laplacian(self.gray, cv2.CV_16S)
+        return cv2.meanStdDev(lap)[1][0, 0] ** 2
+
+    @cached_property
+    def mean_gradient(self):
+        """Rata-rata gradient magnitude (Sobel 3x3, int16 lalu magnitude float32)"""
+        return gradient_sum(self.gray) / self.gray.size
+
+    def blur(self, threshold=100.0):
+        # Metode 1: Variance of Laplacian
+        laplacian_var = self.laplacian_var
+
+        # Metode 2: Gradient magnitude
+        mean_gradient = self.mean_gradient
+
+        return {
+            'is_blurry': laplacian_var < threshold,
+            'laplacian_var': laplacian_var,
+            'mean_gradient': mean_gradient,
+            'blur_severity': max(0, 1 - (laplacian_var / threshold))
+        }
+
+    # ---------- Semua metrik auto_enhance ----------
+
+    # Metrik yang saling independen setelah gray tersedia
+    METRICS = ('noise', 'brightness', 'dynamic_range', 'color_cast', 'contrast',
+               'saturation', 'laplacian_var', 'mean_gradient')
+
+    def measure(self, pool=None):
+        """
+        Hitung semua metrik yang dipakai auto_enhance dan kembalikan dict
+        {nama: nilai} (color_cast/contrast/saturation/blur dengan threshold
+        default). Jika pool (ThreadPoolExecutor) diberikan, metrik dihitung
+        paralel; OpenCV dan NumPy melepas GIL pada hampir semua operasinya.
+        """
+        self.gray  # dipakai hampir semua metrik, hitung sekali di depan
+
+        def compute(name):
+            with timed(f'analysis.{name}', self.img):
+                value = getattr(self, name)
+                return value() if callable(value) else value
+
+        if pool is None:
+            results = {name: compute(name) for name in self.METRICS}
+        else:
+            # copy_context agar timing tetap tercatat di request yang sama
+            futures = {name: pool.submit(copy_context().run, compute, name) for name in self.METRICS}
+            results = {name: future.result() for name, future in futures.items()}
+
+        results['blur'] = self.blur()
+        return results
+
+def gradient_sum(gray, inner=None):
+    """
+    Jumlah gradient magnitude Sobel 3x3 (opsional hanya bagian inner,
+    indeks/slice tanpa halo, dipakai analisis per strip dan per patch).
+    Sobel uint8 muat di int16; magnitude dihitung dalam float32 dan
+    dijumlahkan dalam double.
+    """
+    grad_x = cv2.Sobel(gray, cv2.CV_16S, 1, 0, ksize=3)
+    grad_y = cv2.Sobel(gray, cv2.CV_16S, 0, 1, ksize=3)
+    if inner is not None:
+        grad_x, grad_y = grad_x[inner], grad_y[inner]
+    # numpy (bukan cv2.magnitude) agar hasil sama persis di thread mana pun
+    magnitude = np.square(grad_x, dtype=np.float32)
+    magnitude += np.square(grad_y, dtype=np.float32)
+    np.sqrt(magnitude, out=magnitude)
+    return magnitude.sum(dtype=np.float64)
+
+def saturation_stats(hsv):
+    """(mean, std, rasio pixel saturasi < 50) kanal S dari gambar HSV"""
+    s = cv2.extractChannel(hsv, 1)
+    mean, std = cv2.meanStdDev(s)
+    # Persentase pixel dengan saturasi rendah (dari histogram S)
+    hist = cv2.calcHist([s], [0], None, [50], [0, 50])
+    return mean[0, 0], std[0, 0], hist.sum(dtype=np.float64) / s.size
+
+# ================= ANALISIS PROXY =================
+
+# Sisi terpanjang proxy piramida untuk statistik global
+PROXY_LONG_EDGE = 640
+# Patch resolusi penuh untuk metrik skala: grid x grid patch berukuran PATCH_SIZE
+PATCH_GRID = 4
+PATCH_SIZE = 128
+
+def pyramid_proxy(img, long_edge=PROXY_LONG_EDGE):
+    """Turunkan dengan cv2.pyrDown sampai sisi terpanjang <= long_edge; kembalikan (proxy, level)"""
+    level = 0
+    while max(img.shape[:2]) > long_edge:
+        img = cv2.pyrDown(img)
+        level += 1
+    return img, level
+
+def patch_origins(h, w, grid=PATCH_GRID, size=PATCH_SIZE):
+    """Pojok kiri atas patch di tengah setiap sel grid (deterministik)"""
+    size = min(size, h, w)
+    origins = []
+    for i in range(grid):
+        for j in range(grid):
+            y = int((i + 0.5) * h / grid - size / 2)
+            x = int((j + 0.5) * w / grid - size / 2)
+            origins.append((min(max(0, y), h - size), min(max(0, x), w - size)))
+    return origins, size
+
+def analyze_proxy(img, long_edge=PROXY_LONG_EDGE, grid=PATCH_GRID, patch_size=PATCH_SIZE):
+    """
+    ImageAnalysis dengan biaya hampir konstan terhadap ukuran gambar.
+
+    Statistik global (brightness, histogram, warna, saturasi) dihitung
+    dari proxy piramida (pyrDown) dengan sisi terpanjang <= long_edge.
+    Metrik yang bergantung skala (noise, variance of Laplacian, gradient)
+    dihitung dari grid x grid patch resolusi penuh.
+
+    Proxy piramida merata-ratakan detail halus (termasuk noise), sehingga
+    sebaran intensitas dan saturasinya lebih sempit dari frame penuh.
+    Selisihnya diukur pada patch yang sama (resolusi penuh vs setelah
+    pyrDown sebanyak level proxy) lalu dikoreksikan ke histogram
+    grayscale, std, dan statistik saturasi proxy, agar percentile dan
+    flag is_low / needs_boost memilih cabang yang sama dengan analisis
+    frame penuh. Gambar yang sudah <= long_edge dianalisis langsung.
+    Input grayscale dianalisis sebagai BGR (lihat as_color).
+    """
+    img = as_color(img)
+    proxy, level = pyramid_proxy(img, long_edge)
+    if level == 0:
+        return ImageAnalysis(img)
+    analysis = ImageAnalysis(proxy)
+
+    h, w = img.shape[:2]
+    origins, size = patch_origins(h, w, grid, patch_size)
+    noise, lap = [], []
+    grad_sum = 0.0
+    full_gray_var, full_sat = [], []
+    pyr_gray_var, pyr_sat = [], []
+    for y, x in origins:
+        # Halo 1 pixel untuk filter 3x3, hanya bagian dalam yang dihitung
+        top, left = max(0, y - 1), max(0, x - 1)
+        region = img[top:min(h, y + size + 1), left:min(w, x + size + 1)]
+        inner = (slice(y - top, y - top + size), slice(x - left, x - left + size))
+
+        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+        blur = cv2.GaussianBlur(gray, (3, 3), 0)
+        noise.append(cv2.subtract(gray, blur, dtype=cv2.CV_16S)[inner])
+        lap.append(cv2.Laplacian(gray, cv2.CV_16S)[inner])
+        grad_sum += gradient_sum(gray, inner)
+
+        # Statistik patch pada resolusi penuh dan pada skala proxy
+        patch = region[inner]
+        small = patch
+        for _ in range(level):
+            small = cv2.pyrDown(small)
+        for src, gray_var, sat in ((patch, full_gray_var, full_sat), (small, pyr_gray_var, pyr_sat)):
+            gray_var.append(cv2.meanStdDev(cv2.cvtColor(src, cv2.COLOR_BGR2GRAY))[1][0, 0] ** 2)
+            sat.append(saturation_stats(cv2.cvtColor(src, cv2.COLOR_BGR2HSV)))
+
+    # Metrik skala dari patch resolusi penuh (override cached_property)
+    analysis.__dict__['noise'] = cv2.meanStdDev(np.concatenate([n.ravel() for n in noise]))[1][0, 0]
+    analysis.__dict__['laplacian_var'] = cv2.meanStdDev(np.concatenate([l.ravel() for l in lap]))[1][0, 0] ** 2
+    analysis.__dict__['mean_gradient'] = grad_sum / (len(origins) * size * size)
+
+    # Kalibrasi grayscale: variance detail yang hilang oleh piramida
+    # dikembalikan dengan meregangkan histogram proxy terhadap mean
+    mean, std = analysis.gray_stats
+    lost = max(0.0, float(np.mean(full_gray_var) - np.mean(pyr_gray_var)))
+    gain = np.sqrt((std * std + lost) / (std * std)) if std > 0 else 1.0
+    levels = np.clip(np.rint(mean + gain * (np.arange(256) - mean)), 0, 255).astype(np.intp)
+    hist = np.bincount(levels, weights=analysis.hist, minlength=256).astype(np.float32)
+    analysis.__dict__['hist'] = hist
+    analysis.__dict__['gray_stats'] = (mean, std * gain)
+
+    # Kalibrasi saturasi: selisih mean / variance / rasio saturasi rendah
+    sat_mean, sat_std, low_sat = analysis.saturation_stats
+    full_sat, pyr_sat = np.mean(full_sat, axis=0), np.mean(pyr_sat, axis=0)
+    sat_var_lost = max(0.0, full_sat[1] ** 2 - pyr_sat[1] ** 2)
+    analysis.__dict__['saturation_stats'] = (
+        max(0.0, sat_mean + full_sat[0] - pyr_sat[0]),
+        np.sqrt(sat_std * sat_std + sat_var_lost),
+        min(1.0, max(0.0, low_sat + full_sat[2] - pyr_sat[2]))
+    )
+    return analysis
 
 # ================= ANALYSIS FUNCTIONS =================
 
 def estimate_noise(img):
     """
-    Estimasi noise dengan menghitung standar deviasi intensitas 
+    Estimasi noise dengan menghitung standar deviasi intensitas
     pada area datar (menggunakan Gaussian blur subtraction).
     """
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    blur = cv2.GaussianBlur(gray, (3, 3), 0)
-    noise = gray.astype(np.float32) - blur.astype(np.float32)
-    std_dev = np.std(noise)
-    return std_dev
+    return ImageAnalysis(img).noise
 
 def analyze_brightness(img):
     """Analisis tingkat kecerahan gambar"""
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    mean_brightness = np.mean(gray)
-    return mean_brightness
+    return ImageAnalysis(img).brightness
 
 def analyze_dynamic_range(img):
     """Analisis dynamic range gambar"""
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    hist = cv2.calcHist([gray], [0], None, [256], [0,256])
-    hist_norm = hist.ravel() / hist.sum()
-    cum_hist = np.cumsum(hist_norm)
-    
-    # Hitung rentang dinamis
-    low_1 = np.searchsorted(cum_hist, 0.01)
-    high_99 = np.searchsorted(cum_hist, 0.99)
-    low_5 = np.searchsorted(cum_hist, 0.05)
-    high_95 = np.searchsorted(cum_hist, 0.95)
-    
-    dynamic_range_99 = high_99 - low_1
-    dynamic_range_95 = high_95 - low_5
-    
-    return {
-        'range_99': dynamic_range_99,
-        'range_95': dynamic_range_95,
-        'low_1': low_1,
-        'high_99': high_99,
-        'low_5': low_5,
-        'high_95': high_95
-    }
+    return ImageAnalysis(img).dynamic_range
 
 def has_color_cast(img, threshold=15):
     """Deteksi color cast dan hitung tingkat severity"""
-    b, g, r = cv2.split(img)
-    mean_b, mean_g, mean_r = np.mean(b), np.mean(g), np.mean(r)
-    
-    max_diff = max(abs(mean_r - mean_g), abs(mean_g - mean_b), abs(mean_b - mean_r))
-    severity = max_diff / 255.0  # Normalisasi ke 0-1
-    
-    return {
-        'has_cast': max_diff > threshold,
-        'severity': severity,
-        'means': (mean_r, mean_g, mean_b)
-    }
+    return ImageAnalysis(img).color_cast(threshold)
 
 def is_low_contrast(img, threshold=0.25):
     """Analisis kontras dengan berbagai metrik"""
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    
-    # Metode 1: Range-based contrast
-    hist = cv2.calcHist([gray], [0], None, [256], [0,256])
-    hist_norm = hist.ravel() / hist.sum()
-    cum_hist = np.cumsum(hist_norm)
-    
-    low = np.searchsorted(cum_hist, 0.01)
-    high = np.searchsorted(cum_hist, 0.99)
-    contrast_ratio = (high - low) / 255.0
-    
-    # Metode 2: Standard deviation contrast
-    std_contrast = np.std(gray) / 255.0
-    
-    # Metode 3: RMS contrast
-    rms_contrast = np.sqrt(np.mean((gray - np.mean(gray))**2)) / 255.0
-    
-    return {
-        'is_low': contrast_ratio < threshold,
-        'range_contrast': contrast_ratio,
-        'std_contrast': std_contrast,
-        'rms_contrast': rms_contrast
-    }
+    return ImageAnalysis(img).contrast(threshold)
 
 def needs_saturation_boost(img, threshold=60):
     """Analisis saturasi dengan detail level"""
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    s = hsv[:, :, 1]
-    
-    mean_saturation = np.mean(s)
-    std_saturation = np.std(s)
-    
-    # Hitung persentase pixel dengan saturasi rendah
-    low_sat_pixels = np.sum(s < 50) / s.size
-    
-    return {
-        'needs_boost': mean_saturation < threshold,
-        'mean_sat': mean_saturation,
-        'std_sat': std_saturation,
-        'low_sat_ratio': low_sat_pixels
-    }
+    return ImageAnalysis(img).saturation(threshold)
 
 def is_blurry(img, threshold=100.0):
     """Analisis blur dengan multiple metrics"""
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    
-    # Metode 1: Variance of Laplacian
-    laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-    
-    # Metode 2: Gradient magnitude
-    grad_x = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-    grad_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-    grad_magnitude = np.sqrt(grad_x**2 + grad_y**2)
-    mean_gradient = np.mean(grad_magnitude)
-    
-    return {
-        'is_blurry': laplacian_var < threshold,
-        'laplacian_var': laplacian_var,
-        'mean_gradient': mean_gradient,
-        'blur_severity': max(0, 1 - (laplacian_var / threshold))
-    }
\ No newline at end of file
+    return ImageAnalysis(img).blur(threshold)
@@ -0,0 +1,173 @@
+"""
+Batch enhancement untuk banyak gambar sekaligus.
+
+Contoh CLI:
+    python -m utils.batch foto/ hasil/
+    python -m utils.batch foto/ hasil/ --params '{"gamma": 0.9, "saturation": 1.2}'
+    python -m utils.batch foto/ hasil/ --workers 8 --recursive
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+import numpy as np
+import pillow_heif
+from PIL import Image
+
+from utils.enhance import auto_enhance
+from utils.pipeline import parse_manual_params, run_manual_pipeline
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.webp', '.heif', '.heic')
+
+# ================= WORKER =================
+
+def init_worker():
+    """OpenCV satu thread per proses agar pool tidak oversubscribe core"""
+    cv2.setNumThreads(1)
+    # Log analisis auto_enhance ke stderr agar stdout CLI tetap berisi NDJSON
+    sys.stdout = sys.stderr
+
+def decode_image(data):
+    """Decode bytes gambar ke array BGR (fallback ke pillow-heif untuk HEIC/HEIF)"""
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if img is not None:
+        return img
+    try:
+        heif_file = pillow_heif.from_bytes(data)
+    except Exception:
+        return None
+    image = Image.frombytes(heif_file.mode, heif_file.size, heif_file.data).convert("RGB")
+    return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+
+def enhance_image(img, params=None):
+    """
+    Enhance satu gambar.
+
+    params None = auto_enhance, selain itu dict parameter manual
+    (nama sama dengan /manual_enhance).
+    """
+    if params is None:
+        return auto_enhance(img)
+    manual_params = parse_manual_params(params)
+    return run_manual_pipeline(img, manual_params), manual_params
+
+def process_job(source, output_path, params=None, data=None):
+    """
+    Proses satu job batch (dijalankan di worker process).
+
+    Gambar dibaca dari data (bytes) jika diberikan, selain itu dari
+    path source.
+    """
+    try:
+        if data is None:
+            with open(source, 'rb') as f:
+                data = f.read()
+        img = decode_image(data)
+        if img is None:
+            return {'source': source, 'error': 'Gambar tidak dapat dibaca.'}
+        result, params_used = enhance_image(img, params)
+        if not cv2.imwrite(output_path, result):
+            return {'source': source, 'error': 'Gagal menyimpan hasil.'}
+        return {'source': source, 'output': output_path, 'params_used': params_used}
+    except Exception as e:
+        return {'source': source, 'error': str(e)}
+
+# ================= POOL =================
+
+_pool = None
+
+def get_pool(workers=None):
+    """
+    Process pool bersama (dibuat saat pertama dipakai, ukuran = jumlah core).
+
+    Worker dibuat dengan spawn, bukan fork: pool bisa dibuat dari thread
+    request Flask saat thread lain (thread pool, janitor, job queue) sedang
+    memegang lock, termasuk lock internal OpenCV, dan child hasil fork
+    mewarisi lock itu dalam keadaan terkunci.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                    mp_context=multiprocessing.get_context('spawn'),
+                                    initializer=init_worker)
+    return _pool
+
+def run_batch(jobs, pool=None, max_pending=None):
+    """
+    Jalankan job (source, output_path, params, data) di process pool dan
+    yield hasil sesuai urutan selesai (bukan urutan input).
+
+    jobs boleh berupa iterator yang membaca data gambar saat dibutuhkan:
+    paling banyak max_pending job (default 2x jumlah core) dikirim ke pool
+    sekaligus, sehingga tidak semua input berada di memori bersamaan.
+    """
+    pool = pool or get_pool()
+    max_pending = max_pending or 2 * (os.cpu_count() or 1)
+    jobs = iter(jobs)
+    pending = set()
+    while True:
+        while len(pending) < max_pending:
+            job = next(jobs, None)
+            if job is None:
+                break
+            pending.add(pool.submit(process_job, *job))
+        if not pending:
+            return
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+def find_images(folder, recursive=False):
+    """Daftar file gambar di folder"""
+    if not recursive:
+        names = sorted(os.listdir(folder))
+        return [os.path.join(folder, n) for n in names if n.lower().endswith(IMAGE_EXTENSIONS)]
+
+    paths = []
+    for root, _, names in os.walk(folder):
+        paths.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(paths)
+
+def output_path_for(source, input_dir, output_dir, suffix):
+    """Path output dengan struktur folder yang sama seperti input"""
+    rel = os.path.relpath(source, input_dir)
+    stem = os.path.splitext(rel)[0]
+    return os.path.join(output_dir, f"{stem}_{suffix}.jpg")
+
+# ================= CLI =================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch enhancement gambar dalam satu folder")
+    parser.add_argument('input_dir')
+    parser.add_argument('output_dir')
+    parser.add_argument('--params', help="JSON parameter manual; tanpa ini memakai auto_enhance")
+    parser.add_argument('--workers', type=int, default=None, help="Jumlah proses (default: jumlah core)")
+    parser.add_argument('--recursive', action='store_true', help="Sertakan subfolder")
+    args = parser.parse_args(argv)
+
+    params = json.loads(args.params) if args.params else None
+    suffix = 'auto' if params is None else 'manual'
+
+    sources = find_images(args.input_dir, args.recursive)
+    jobs = []
+    for source in sources:
+        output_path = output_path_for(source, args.input_dir, args.output_dir, suffix)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        jobs.append((source, output_path, params))
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers or os.cpu_count(),
+                             initializer=init_worker) as pool:
+        for result in run_batch(jobs, pool):
+            failed += 'error' in result
+            print(json.dumps(result, default=float), flush=True)
+
+    print(f"{len(jobs) - failed}/{len(jobs)} gambar berhasil diproses", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
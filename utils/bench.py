@@ -0,0 +1,214 @@
+"""
+Benchmark fungsi analisis dan enhancement.
+
+Contoh:
+    python -m utils.bench
+    python -m utils.bench --sizes 640x480,1920x1080 --repeat 10 --output bench.json
+    python -m utils.bench --only auto_enhance,manual_pipeline
+
+Hasil berupa JSON: median/p95 latency (ms), throughput (megapixel/detik),
+dan puncak memori (tracemalloc, alokasi NumPy/Python) per benchmark.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from utils import analysis, enhance
+from utils.analysis import ImageAnalysis
+from utils.pipeline import MANUAL_DEFAULTS, parse_manual_params, run_manual_pipeline
+
+DEFAULT_SIZES = ((640, 480), (1280, 720), (1920, 1080))
+
+# ================= GAMBAR SINTETIS =================
+
+# Kondisi gambar sintetis; masing-masing memicu cabang berbeda di auto_enhance
+IMAGE_KINDS = ('clean', 'noisy', 'very_noisy', 'color_cast', 'low_contrast', 'blurry', 'desaturated', 'bright')
+
+def synthetic_image(kind, width, height, seed=0):
+    """
+    Gambar sintetis deterministik: gradien warna + pola tepi, dengan
+    noise, color cast, blur, atau kontras rendah sesuai kind.
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.dstack([
+        255 * x / width,
+        255 * y / height,
+        255 * (x + y) / (width + height)
+    ])
+    # Pola kotak-kotak untuk detail/tepi
+    checker = ((x // 32 + y // 32) % 2) * 60 - 30
+    base += checker[:, :, None]
+
+    if kind == 'noisy':
+        base += rng.normal(0, 15, base.shape)
+    elif kind == 'very_noisy':
+        base += rng.normal(0, 60, base.shape)
+    elif kind == 'color_cast':
+        base = base * np.array([0.55, 0.7, 1.15]) * 0.6
+    elif kind == 'low_contrast':
+        base = base * 0.15 + 100
+    elif kind == 'blurry':
+        base = cv2.GaussianBlur(base, (0, 0), 4)
+    elif kind == 'desaturated':
+        gray = base.mean(axis=2, keepdims=True)
+        base = gray + (base - gray) * 0.1
+    elif kind == 'bright':
+        base = base * 0.35 + 170
+
+    return np.clip(base, 0, 255).astype(np.uint8)
+
+# ================= PENGUKURAN =================
+
+def measure(fn, repeat, pixels):
+    """Jalankan fn sebanyak repeat kali; kembalikan statistik latency dan memori"""
+    fn()  # warm-up (alokasi pool, inisialisasi OpenCV)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    # Memori diukur pada satu run terpisah agar overhead tracemalloc
+    # tidak mempengaruhi latency
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times_ms = np.array(times) * 1000
+    median = float(np.median(times_ms))
+    return {
+        'median_ms': round(median, 3),
+        'p95_ms': round(float(np.percentile(times_ms, 95)), 3),
+        'min_ms': round(float(times_ms.min()), 3),
+        'throughput_mpix_s': round(pixels / 1e6 / (median / 1000), 2) if median > 0 else None,
+        'peak_traced_mb': round(peak / (1024 * 1024), 2)
+    }
+
+def benchmarks(img):
+    """Daftar (nama, fungsi) yang diukur untuk satu gambar"""
+    info = ImageAnalysis(img)
+    noise_std = info.noise
+    manual = parse_manual_params(dict(MANUAL_DEFAULTS, r_gain=1.1, b_gain=0.9, gamma=0.8, saturation=1.2))
+
+    # Info analisis yang dipaksa aktif agar setiap stage adaptif terukur
+    cast_info = dict(info.color_cast(), has_cast=True)
+    contrast_info = dict(info.contrast(), is_low=True)
+    sat_info = dict(info.saturation(), needs_boost=True)
+    blur_info = dict(info.blur(), is_blurry=True)
+
+    return [
+        # Analisis (fungsi wrapper, masing-masing analisis baru)
+        ('analysis.estimate_noise', lambda: analysis.estimate_noise(img)),
+        ('analysis.analyze_brightness', lambda: analysis.analyze_brightness(img)),
+        ('analysis.analyze_dynamic_range', lambda: analysis.analyze_dynamic_range(img)),
+        ('analysis.has_color_cast', lambda: analysis.has_color_cast(img)),
+        ('analysis.is_low_contrast', lambda: analysis.is_low_contrast(img)),
+        ('analysis.needs_saturation_boost', lambda: analysis.needs_saturation_boost(img)),
+        ('analysis.is_blurry', lambda: analysis.is_blurry(img)),
+        ('analysis.all_metrics', lambda: all_metrics(img)),
+        # Stage manual
+        ('enhance.white_balance_grayworld', lambda: enhance.white_balance_grayworld(img, 1.1, 1.0, 0.9)),
+        ('enhance.denoise_bilateral', lambda: enhance.denoise_bilateral(img, 3, 60)),
+        ('enhance.gamma_correction', lambda: enhance.gamma_correction(img, 0.8)),
+        ('enhance.enhance_contrast_clahe', lambda: enhance.enhance_contrast_clahe(img, 2.0, 8)),
+        ('enhance.enhance_saturation', lambda: enhance.enhance_saturation(img, 1.2)),
+        ('enhance.unsharp_masking', lambda: enhance.unsharp_masking(img, 1.0, 100)),
+        # Stage adaptif (auto)
+        ('enhance.adaptive_white_balance', lambda: enhance.adaptive_white_balance(img, cast_info)),
+        ('enhance.adaptive_denoise_bilateral', lambda: enhance.adaptive_denoise_bilateral(img, noise_std)),
+        ('enhance.adaptive_denoise_nlm', lambda: enhance.adaptive_denoise_nlm(img, max(noise_std, 26))),
+        ('enhance.adaptive_denoise_nlm_half', lambda: enhance.adaptive_denoise_nlm(img, max(noise_std, 26), backend='nlm_half')),
+        ('enhance.adaptive_denoise_nlm_bilateral', lambda: enhance.adaptive_denoise_nlm(img, max(noise_std, 26), backend='bilateral')),
+        ('enhance.gamma_correction_adaptive', lambda: enhance.gamma_correction_adaptive(img, 80, info.dynamic_range)),
+        ('enhance.adaptive_contrast_clahe', lambda: enhance.adaptive_contrast_clahe(img, contrast_info, info.brightness)),
+        ('enhance.adaptive_saturation_enhancement', lambda: enhance.adaptive_saturation_enhancement(img, sat_info)),
+        ('enhance.adaptive_unsharp_masking', lambda: enhance.adaptive_unsharp_masking(img, blur_info, noise_std)),
+        # Pipeline lengkap
+        ('auto_enhance', lambda: quiet(enhance.auto_enhance, img)),
+        ('manual_pipeline', lambda: run_manual_pipeline(img, manual)),
+    ]
+
+def all_metrics(img):
+    """Semua metrik auto_enhance dari satu ImageAnalysis"""
+    info = ImageAnalysis(img)
+    return (info.noise, info.brightness, info.dynamic_range, info.color_cast(),
+            info.contrast(), info.saturation(), info.blur())
+
+def quiet(fn, *args, **kwargs):
+    """Jalankan fn tanpa output print (log analisis auto_enhance)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+def run(sizes=DEFAULT_SIZES, kinds=IMAGE_KINDS, repeat=5, only=None):
+    """Jalankan semua benchmark dan kembalikan hasil dalam bentuk dict"""
+    results = []
+    for width, height in sizes:
+        pixels = width * height
+        for kind in kinds:
+            img = synthetic_image(kind, width, height)
+            # Stage tunggal tidak bergantung kondisi gambar; cukup ukur sekali per ukuran
+            for name, fn in benchmarks(img):
+                per_kind = name in ('auto_enhance', 'analysis.all_metrics')
+                if only and name not in only:
+                    continue
+                if not per_kind and kind != kinds[0]:
+                    continue
+                entry = {'name': name, 'width': width, 'height': height}
+                if per_kind:
+                    entry['kind'] = kind
+                entry.update(measure(fn, repeat, pixels))
+                results.append(entry)
+                print(f"{name} {width}x{height} {kind if per_kind else ''}: "
+                      f"{entry['median_ms']} ms", file=sys.stderr)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'opencv_threads': cv2.getNumThreads(),
+            'machine': platform.machine()
+        },
+        'repeat': repeat,
+        'results': results,
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+def parse_sizes(value):
+    return tuple(tuple(int(v) for v in size.lower().split('x')) for size in value.split(','))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark analisis dan enhancement")
+    parser.add_argument('--sizes', type=parse_sizes, default=DEFAULT_SIZES,
+                        help="Daftar ukuran WxH dipisah koma (default: 640x480,1280x720,1920x1080)")
+    parser.add_argument('--kinds', default=','.join(IMAGE_KINDS),
+                        help="Kondisi gambar sintetis dipisah koma")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', help="Nama benchmark dipisah koma")
+    parser.add_argument('--output', help="Tulis JSON ke file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    only = set(args.only.split(',')) if args.only else None
+    report = run(args.sizes, tuple(args.kinds.split(',')), args.repeat, only)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
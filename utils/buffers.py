@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# ================= SCRATCH BUFFER POOL =================
+
+class BufferPool:
+    """
+    Pool buffer scratch yang dipakai ulang antar request.
+
+    Buffer disimpan per thread (satu worker = satu set buffer) dan
+    diidentifikasi dengan nama, shape, dan dtype. Buffer dari pool hanya
+    untuk data sementara di dalam satu stage; jangan pernah dikembalikan
+    ke pemanggil sebagai hasil akhir karena isinya akan ditimpa oleh
+    request berikutnya.
+
+    Per thread disimpan paling banyak max_buffers buffer dengan total
+    max_bytes (LRU). Buffer di atas max_buffer_bytes (misalnya frame
+    resolusi penuh) tidak disimpan: dialokasikan baru setiap kali agar
+    memorinya dilepas setelah render.
+    """
+
+    def __init__(self, max_buffers=16, max_bytes=128 * 1024 * 1024, max_buffer_bytes=32 * 1024 * 1024):
+        self.max_buffers = max_buffers
+        self.max_bytes = max_bytes
+        self.max_buffer_bytes = max_buffer_bytes
+        self._local = threading.local()
+
+    def _buffers(self):
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = OrderedDict()
+        return buffers
+
+    def get(self, name, shape, dtype=np.uint8):
+        """Ambil buffer (isi tidak diinisialisasi) dengan shape dan dtype tertentu"""
+        buffers = self._buffers()
+        key = (name, tuple(shape), np.dtype(dtype).str)
+        buf = buffers.get(key)
+        if buf is None:
+            buf = np.empty(shape, dtype=dtype)
+            if buf.nbytes > self.max_buffer_bytes:
+                return buf
+            buffers[key] = buf
+            total = self.nbytes()
+            while len(buffers) > self.max_buffers or total > self.max_bytes:
+                total -= buffers.popitem(last=False)[1].nbytes
+        else:
+            buffers.move_to_end(key)
+        return buf
+
+    def nbytes(self):
+        """Total memori buffer milik thread saat ini"""
+        return sum(buf.nbytes for buf in self._buffers().values())
+
+    def clear(self):
+        self._buffers().clear()
+
+# Pool default per proses (per thread di dalamnya)
+scratch = BufferPool()
+
+# ================= CLAHE CACHE =================
+
+class ClaheCache:
+    """
+    Cache objek cv2.CLAHE per (clip_limit, tile_grid).
+
+    Objek CLAHE menyimpan buffer internal saat apply(), sehingga satu
+    objek tidak boleh dipakai dua thread sekaligus. Seperti BufferPool,
+    cache disimpan per thread dengan batas max_entries (LRU).
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def get(self, clip_limit, tile_grid):
+        entries = getattr(self._local, 'entries', None)
+        if entries is None:
+            entries = self._local.entries = OrderedDict()
+        key = (float(clip_limit), int(tile_grid))
+        clahe = entries.get(key)
+        hit = clahe is not None
+        if hit:
+            entries.move_to_end(key)
+        else:
+            clahe = cv2.createCLAHE(clipLimit=key[0], tileGridSize=(key[1], key[1]))
+            entries[key] = clahe
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return clahe
+
+    def stats(self):
+        with self._lock:
+            return {'max_entries_per_thread': self.max_entries, 'hits': self.hits, 'misses': self.misses}
+
+# Cache CLAHE default per proses (per thread di dalamnya)
+clahe_cache = ClaheCache()
@@ -1,34 +1,33 @@
+import threading
+import time
+
 import cv2
 import numpy as np
-from utils.analysis import (
-    estimate_noise,
-    has_color_cast,
-    is_low_contrast,
-    is_blurry,
-    analyze_brightness,
-    analyze_dynamic_range,
-    needs_saturation_boost
-)
-
-def denoise_bilateral(img, sigma_space=3, sigma_color=60):
-    """Terapkan bilateral filter untuk denoising ringan"""
+from utils.analysis import ImageAnalysis
+from utils.buffers import clahe_cache, scratch
+from utils.metrics import timed
+from utils.pointops import PointOps, chroma_table, gain_table, gamma_table
+from utils.tiles import gaussian_halo, run_direct
+
+# Catatan buffer: semua stage menerima dst= (buffer output uint8 dengan
+# shape yang sama). Kecuali bilateral/NLM, dst boleh sama dengan img
+# sehingga stage bisa bekerja in-place. Data sementara (LAB, HSV, float32)
+# diambil dari pool scratch per worker, bukan dialokasikan ulang.
+
+def denoise_bilateral(img, sigma_space=3, sigma_color=60, dst=None):
+    """Terapkan bilateral filter untuk denoising ringan (dst tidak boleh sama dengan img)"""
     if sigma_space <= 0 and sigma_color <= 0:
         return img
     
-    return cv2.bilateralFilter(img, d=9, sigmaColor=sigma_color, sigmaSpace=sigma_space)
+    return cv2.bilateralFilter(img, d=9, sigmaColor=sigma_color, sigmaSpace=sigma_space, dst=dst)
 
 def denoise_nlm(img):
     """Terapkan Non-Local Means untuk noise berat"""
     return cv2.fastNlMeansDenoisingColored(img, None, 10, 10, 7, 21)
 
-def white_balance_grayworld(img, r_gain=1.0, g_gain=1.0, b_gain=1.0):
+def white_balance_grayworld(img, r_gain=1.0, g_gain=1.0, b_gain=1.0, dst=None):
     """Koreksi white balance menggunakan Gray-World Assumption"""
-    b, g, r = cv2.split(img.astype(np.float32))
-    b *= b_gain
-    g *= g_gain
-    r *= r_gain
-    result = cv2.merge((b, g, r))
-    return np.clip(result, 0, 255).astype(np.uint8)
+    return PointOps().gains(r_gain, g_gain, b_gain).apply(img, dst=dst)
 
 def auto_white_balance_grayworld(img):
     """Auto-koreksi white balance jika color cast terdeteksi"""
@@ -40,17 +39,43 @@ def auto_white_balance_grayworld(img):
     r_gain = avg_gray / avg_r
     return white_balance_grayworld(img, r_gain, g_gain, b_gain)
 
-def enhance_contrast_clahe(img, clip_limit=2.0, tile_grid=8):
+def clahe_l_channel(lab, clip_limit, tile_grid):
+    """CLAHE in-place pada kanal L buffer LAB; hanya kanal L yang diekstrak dan ditulis ulang"""
+    plane = lab.shape[:2]
+    l = cv2.extractChannel(lab, 0, dst=scratch.get('plane', plane))
+    clahe = clahe_cache.get(clip_limit, tile_grid)
+    cl = clahe.apply(l, dst=scratch.get('plane_out', plane))
+    cv2.insertChannel(cl, lab, 0)
+    return lab
+
+def apply_clahe_lab(img, clip_limit, tile_grid, dst=None):
+    """CLAHE pada kanal L (LAB)"""
+    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB, dst=scratch.get('lab', img.shape))
+    clahe_l_channel(lab, clip_limit, tile_grid)
+    return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=dst)
+
+def scale_chroma_lab(lab, scale):
+    """
+    Saturasi sebagai skala chroma in-place pada buffer LAB: kanal a dan b
+    dijauhkan/didekatkan ke netral (128), L tidak berubah. Berbeda dengan
+    skala S pada HSV, kecerahan warna yang diperkuat tetap sama.
+    """
+    return cv2.LUT(lab, chroma_table(scale), dst=lab)
+
+def scale_saturation(img, scale, dst=None):
+    """Skalakan kanal S (HSV) saja menggunakan LUT, kanal H dan V tidak disentuh"""
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV, dst=scratch.get('hsv', img.shape))
+    s = cv2.extractChannel(hsv, 1, dst=scratch.get('plane', img.shape[:2]))
+    cv2.LUT(s, gain_table(scale), dst=s)
+    cv2.insertChannel(s, hsv, 1)
+    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR, dst=dst)
+
+def enhance_contrast_clahe(img, clip_limit=2.0, tile_grid=8, dst=None):
     """Terapkan CLAHE pada channel L atau V (jika HSV)"""
     if clip_limit <= 0:
         return img
     
-    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile_grid, tile_grid))
-    cl = clahe.apply(l)
-    merged = cv2.merge((cl, a, b))
-    return cv2.cvtColor(merged, cv2.COLOR_LAB2BGR)
+    return apply_clahe_lab(img, clip_limit, tile_grid, dst=dst)
 
 def enhance_contrast_histogram(img):
     """Alternatif kontras: histogram equalization global (grayscale)"""
@@ -58,25 +83,20 @@ def enhance_contrast_histogram(img):
     eq = cv2.equalizeHist(gray)
     return cv2.cvtColor(eq, cv2.COLOR_GRAY2BGR)
 
-def enhance_saturation(img, scale=1.1):
+def enhance_saturation(img, scale=1.1, dst=None):
     """Tingkatkan saturasi pada channel HSV"""
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).astype(np.float32)
-    h, s, v = cv2.split(hsv)
-    s *= scale
-    s = np.clip(s, 0, 255)
-    enhanced = cv2.merge((h, s, v))
-    return cv2.cvtColor(enhanced.astype(np.uint8), cv2.COLOR_HSV2BGR)
-
-def unsharp_masking(img, radius=1.0, amount=100):
+    return scale_saturation(img, scale, dst=dst)
+
+def unsharp_masking(img, radius=1.0, amount=100, dst=None):
     """Terapkan penajaman dengan unsharp masking"""
     if radius <= 0.1 and amount <= 0:
         return img
     
-    blurred = cv2.GaussianBlur(img, (0, 0), sigmaX=radius)
-    sharpened = cv2.addWeighted(img, 1 + (amount / 100.0), blurred, -(amount / 100.0), 0)
-    return np.clip(sharpened, 0, 255).astype(np.uint8)
+    blurred = cv2.GaussianBlur(img, (0, 0), sigmaX=radius, dst=scratch.get('blur', img.shape))
+    # addWeighted pada uint8 sudah saturasi ke 0-255, tidak perlu clip lagi
+    return cv2.addWeighted(img, 1 + (amount / 100.0), blurred, -(amount / 100.0), 0, dst=dst)
 
-def gamma_correction(img, gamma=None):
+def gamma_correction(img, gamma=None, dst=None):
     """
     Gamma correction manual.
     
@@ -90,14 +110,17 @@ def gamma_correction(img, gamma=None):
     if gamma is None:
         gamma = 1.0  # default normal gamma
 
-    # Apply gamma correction
-    table = np.array([((i / 255.0) ** gamma) * 255 for i in np.arange(0, 256)]).astype(np.uint8)
-    corrected = cv2.LUT(img, table)
+    return cv2.LUT(img, gamma_table(gamma), dst=dst)
 
-    return corrected
 
+def scale_window(size, spatial_scale):
+    """Skalakan ukuran jendela filter (ganjil, minimal 3) untuk gambar proxy"""
+    if spatial_scale == 1.0:
+        return size
+    scaled = max(3, int(round(size * spatial_scale)))
+    return scaled if scaled % 2 == 1 else scaled + 1
 
-def adaptive_denoise_bilateral(img, noise_std):
+def adaptive_denoise_bilateral(img, noise_std, spatial_scale=1.0, dst=None):
     """Bilateral filter dengan parameter adaptif"""
     # Parameter adaptif berdasarkan noise level
     if noise_std < 5:
@@ -109,7 +132,10 @@ def adaptive_denoise_bilateral(img, noise_std):
     else:
         d, sigma_color, sigma_space = 11, 90, 90
     
-    filtered_img = cv2.bilateralFilter(img, d=d, sigmaColor=sigma_color, sigmaSpace=sigma_space)
+    # Parameter dilaporkan dalam skala penuh, diterapkan dalam skala proxy
+    filtered_img = cv2.bilateralFilter(img, d=scale_window(d, spatial_scale),
+                                       sigmaColor=sigma_color,
+                                       sigmaSpace=sigma_space * spatial_scale, dst=dst)
     params_used = {
         'denoise_d': d,
         'sigma_color': sigma_color,
@@ -118,19 +144,116 @@ def adaptive_denoise_bilateral(img, noise_std):
     
     return filtered_img, params_used
 
-def adaptive_denoise_nlm(img, noise_std):
-    """Non-Local Means dengan parameter adaptif"""
-    # Parameter berdasarkan tingkat noise
-    if noise_std < 20:
-        h, template_window, search_window = 8, 7, 21
-    elif noise_std < 35:
-        h, template_window, search_window = 12, 7, 21
+# ================= DENOISE BACKEND =================
+
+# Backend denoise untuk noise berat, urut dari kualitas tertinggi ke tercepat:
+# - nlm: Non-Local Means berwarna pada resolusi penuh
+# - nlm_half: NLM pada setengah resolusi lalu upsample bilinear (~10x lebih cepat)
+# - bilateral: bilateral filter tier terkuat (paling cepat)
+DENOISE_BACKENDS = ('nlm', 'nlm_half', 'bilateral')
+
+# Perkiraan biaya (ms per megapixel, satu thread OpenCV); diperbarui dari
+# waktu aktual setiap kali stage denoise berjalan pada resolusi penuh
+_denoise_cost = {'nlm': 3800.0, 'nlm_half': 350.0, 'bilateral': 280.0}
+_denoise_cost_lock = threading.Lock()
+
+def choose_denoise_backend(pixels, budget_ms=None):
+    """
+    Pilih backend berkualitas tertinggi yang perkiraan waktunya untuk
+    gambar berukuran pixels masih di dalam budget_ms (None = selalu nlm).
+
+    Pilihan bergantung pada model biaya saat ini, jadi pilih sekali per
+    request dan teruskan hasilnya (lihat parameter denoise_backend pada
+    auto_enhance), misalnya sebagai bagian dari kunci cache.
+    """
+    if budget_ms is None:
+        return DENOISE_BACKENDS[0]
+    with _denoise_cost_lock:
+        costs = dict(_denoise_cost)
+    mpix = pixels / 1e6
+    threads = max(1, cv2.getNumThreads())
+    for backend in DENOISE_BACKENDS:
+        if costs[backend] * mpix / threads <= budget_ms:
+            return backend
+    return DENOISE_BACKENDS[-1]
+
+def record_denoise_cost(backend, pixels, elapsed_ms):
+    """Perbarui perkiraan biaya backend (rata-rata eksponensial) dari satu stage satu frame penuh"""
+    if pixels <= 0:
+        return
+    cost = elapsed_ms * max(1, cv2.getNumThreads()) / (pixels / 1e6)
+    with _denoise_cost_lock:
+        _denoise_cost[backend] += 0.3 * (cost - _denoise_cost[backend])
+
+def denoise_nlm_half(img, h, template_window, search_window, dst=None):
+    """
+    NLM pada setengah resolusi. Downscale INTER_AREA merata-ratakan 2x2
+    pixel sehingga deviasi noise turun setengah; h dan ukuran jendela
+    ikut diskalakan 0.5.
+
+    Tinggi/lebar ganjil dipad dulu satu pixel (BORDER_REFLECT_101) agar
+    downscale dan upsample tepat 2x; tanpa ini grid upsample bergeser di
+    seluruh frame dan hasil per strip tidak sama dengan satu frame.
+    """
+    height, width = img.shape[:2]
+    pad_bottom, pad_right = height % 2, width % 2
+    padded = img
+    if pad_bottom or pad_right:
+        padded = cv2.copyMakeBorder(img, 0, pad_bottom, 0, pad_right, cv2.BORDER_REFLECT_101)
+    small = cv2.resize(padded, (padded.shape[1] // 2, padded.shape[0] // 2), interpolation=cv2.INTER_AREA)
+    denoised = cv2.fastNlMeansDenoisingColored(small, None, h * 0.5, h * 0.5,
+                                               scale_window(template_window, 0.5),
+                                               scale_window(search_window, 0.5))
+    if padded is img:
+        return cv2.resize(denoised, (width, height), dst=dst, interpolation=cv2.INTER_LINEAR)
+    upsampled = cv2.resize(denoised, (padded.shape[1], padded.shape[0]), interpolation=cv2.INTER_LINEAR)
+    if dst is None:
+        return upsampled[:height, :width].copy()
+    np.copyto(dst, upsampled[:height, :width])
+    return dst
+
+def adaptive_denoise_nlm(img, noise_std, spatial_scale=1.0, backend='nlm', dst=None):
+    """Denoise noise berat dengan parameter adaptif menggunakan backend yang dipilih"""
+    params_used = {'denoise_backend': backend}
+    if backend == 'bilateral':
+        filtered_img, bilateral_params = adaptive_denoise_bilateral(img, noise_std, spatial_scale, dst=dst)
+        params_used.update(bilateral_params)
     else:
-        h, template_window, search_window = 15, 9, 25
-    
-    return cv2.fastNlMeansDenoisingColored(img, None, h, h, template_window, search_window)
+        # Parameter berdasarkan tingkat noise
+        if noise_std < 20:
+            h, template_window, search_window = 8, 7, 21
+        elif noise_std < 35:
+            h, template_window, search_window = 12, 7, 21
+        else:
+            h, template_window, search_window = 15, 9, 25
+
+        template_window = scale_window(template_window, spatial_scale)
+        search_window = scale_window(search_window, spatial_scale)
+        if backend == 'nlm_half':
+            filtered_img = denoise_nlm_half(img, h, template_window, search_window, dst=dst)
+        else:
+            filtered_img = cv2.fastNlMeansDenoisingColored(img, dst, h, h, template_window, search_window)
+        params_used['nlm_h'] = h
+    return filtered_img, params_used
+
+# Radius kernel maksimum stage adaptif (untuk halo pemrosesan per strip)
+def bilateral_halo(spatial_scale=1.0):
+    return scale_window(11, spatial_scale) // 2
 
-def adaptive_white_balance(img, cast_info):
+def nlm_halo(spatial_scale=1.0, backend='nlm'):
+    if backend == 'bilateral':
+        return bilateral_halo(spatial_scale)
+    radius = scale_window(9, spatial_scale) // 2 + scale_window(25, spatial_scale) // 2
+    if backend == 'nlm_half':
+        # Jendela setengah resolusi dalam pixel penuh, plus interpolasi;
+        # genap agar grid downscale 2x2 setiap strip tetap sejajar
+        radius = 2 * (scale_window(9, spatial_scale * 0.5) // 2 + scale_window(25, spatial_scale * 0.5) // 2) + 2
+    return radius
+
+def sharpen_halo(spatial_scale=1.0):
+    return gaussian_halo(2.0 * spatial_scale, float_depth=True)
+
+def adaptive_white_balance(img, cast_info, dst=None):
     """White balance adaptif berdasarkan severity color cast"""
     if not cast_info['has_cast']:
         return img
@@ -158,23 +281,11 @@ def adaptive_white_balance(img, cast_info):
     g_gain = np.clip(g_gain, 0.5, 2.0)
     r_gain = np.clip(r_gain, 0.5, 2.0)
     
-    # Apply white balance with proper data type handling
-    img_float = img.astype(np.float32)
-    b, g, r = cv2.split(img_float)
-    
-    b *= b_gain
-    g *= g_gain
-    r *= r_gain
-    
-    # Ensure all channels have same data type
-    b = np.clip(b, 0, 255).astype(np.float32)
-    g = np.clip(g, 0, 255).astype(np.float32)
-    r = np.clip(r, 0, 255).astype(np.float32)
-    
-    result = cv2.merge((b, g, r))
-    return result.astype(np.uint8), {'r_gain': r_gain, 'g_gain': g_gain, 'b_gain': b_gain}
+    # Apply white balance sebagai satu LUT per kanal
+    result = PointOps().gains(r_gain, g_gain, b_gain).apply(img, dst=dst)
+    return result, {'r_gain': r_gain, 'g_gain': g_gain, 'b_gain': b_gain}
 
-def adaptive_contrast_clahe(img, contrast_info, brightness):
+def adaptive_contrast_clahe(img, contrast_info, brightness, dst=None):
     """CLAHE dengan parameter adaptif"""
     if not contrast_info['is_low']:
         return img
@@ -206,25 +317,11 @@ def adaptive_contrast_clahe(img, contrast_info, brightness):
     elif std_contrast > 0.2:  # High variation
         tile_size = 12  # Larger tiles for smoother result
     
-    # Convert to LAB color space
-    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    
-    # Apply CLAHE to L channel
-    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile_size, tile_size))
-    cl = clahe.apply(l)
-    
-    # Ensure all channels have same data type
-    cl = cl.astype(np.uint8)
-    a = a.astype(np.uint8)
-    b = b.astype(np.uint8)
-    
-    # Merge channels back
-    merged = cv2.merge((cl, a, b))
-    result_img = cv2.cvtColor(merged, cv2.COLOR_LAB2BGR)
+    # Apply CLAHE to L channel (LAB)
+    result_img = apply_clahe_lab(img, clip_limit, tile_size, dst=dst)
     return result_img, {'clip_limit': clip_limit, 'tile_grid': tile_size}
 
-def adaptive_saturation_enhancement(img, sat_info):
+def adaptive_saturation_enhancement(img, sat_info, dst=None):
     """Peningkatan saturasi adaptif"""
     if not sat_info['needs_boost']:
         return img
@@ -244,28 +341,11 @@ def adaptive_saturation_enhancement(img, sat_info):
     # Limit maximum enhancement
     scale = min(scale, 1.5)
     
-    # Convert to HSV with proper data type handling
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    hsv_float = hsv.astype(np.float32)
-    h, s, v = cv2.split(hsv_float)
-    
-    # Apply saturation enhancement with proper scaling
-    s_enhanced = s * scale
-    s_enhanced = np.clip(s_enhanced, 0, 255)
-    
-    # Ensure all channels have the same data type and shape
-    h = h.astype(np.float32)
-    s_enhanced = s_enhanced.astype(np.float32)
-    v = v.astype(np.float32)
-    
-    # Merge channels
-    enhanced_hsv = cv2.merge((h, s_enhanced, v))
-    enhanced_hsv = enhanced_hsv.astype(np.uint8)
-    
-    result_img = cv2.cvtColor(enhanced_hsv, cv2.COLOR_HSV2BGR)
+    # Apply saturation enhancement pada kanal S saja
+    result_img = scale_saturation(img, scale, dst=dst)
     return result_img, {'saturation': scale}
 
-def adaptive_unsharp_masking(img, blur_info, noise_std):
+def adaptive_unsharp_masking(img, blur_info, noise_std, spatial_scale=1.0, dst=None):
     """Unsharp masking adaptif"""
     if not blur_info['is_blurry']:
         return img
@@ -296,20 +376,26 @@ def adaptive_unsharp_masking(img, blur_info, noise_std):
     radius = max(0.5, min(radius, 2.0))
     amount = max(20, min(amount, 150))
     
-    # Apply unsharp masking with proper data type handling
-    img_float = img.astype(np.float32)
-    blurred = cv2.GaussianBlur(img_float, (0, 0), sigmaX=radius)
+    # Apply unsharp masking dalam float32 (buffer scratch, in-place)
+    img_float = scratch.get('float', img.shape, np.float32)
+    np.copyto(img_float, img)
+    blurred = cv2.GaussianBlur(img_float, (0, 0), sigmaX=radius * spatial_scale,
+                               dst=scratch.get('float_blur', img.shape, np.float32))
     
-    # Calculate the sharpened image
-    sharpened = img_float + (amount / 100.0) * (img_float - blurred)
+    # sharpened = img + k * (img - blurred)
+    np.subtract(img_float, blurred, out=blurred)
+    blurred *= amount / 100.0
+    img_float += blurred
     
     # Clip and convert back to uint8
-    sharpened = np.clip(sharpened, 0, 255).astype(np.uint8)
+    np.clip(img_float, 0, 255, out=img_float)
+    sharpened = np.empty(img.shape, dtype=np.uint8) if dst is None else dst
+    np.copyto(sharpened, img_float, casting='unsafe')
     
     return sharpened, {'sharpen_radius': radius, 'sharpen_amount': amount}
 
 
-def gamma_correction_adaptive(img, brightness, dynamic_range_info):
+def gamma_correction_adaptive(img, brightness, dynamic_range_info, dst=None):
     """Gamma correction adaptif berdasarkan brightness dan dynamic range"""
     # Hitung gamma berdasarkan brightness
     if brightness < 60:  # Very dark
@@ -321,7 +407,7 @@ def gamma_correction_adaptive(img, brightness, dynamic_range_info):
     elif brightness > 140:  # Bright
         gamma = 1.2
     else:  # Normal
-        return img
+        return img, {}
 
     # Adjust gamma berdasarkan dynamic range
     dr_95 = dynamic_range_info['range_95']
@@ -329,28 +415,54 @@ def gamma_correction_adaptive(img, brightness, dynamic_range_info):
         gamma = gamma * 0.9  # Less aggressive correction
 
     # Apply gamma correction
-    table = np.array([((i / 255.0) ** gamma) * 255 for i in np.arange(0, 256)]).astype(np.uint8)
-    corrected = cv2.LUT(img, table)
+    corrected = cv2.LUT(img, gamma_table(gamma), dst=dst)
 
     return corrected, {'gamma': gamma}
 
 
-def auto_enhance(img):
+def auto_enhance(img, analysis=None, spatial_scale=1.0, runner=None, denoise_budget_ms=None, pool=None,
+                 denoise_backend=None):
     """
     Enhancement otomatis dengan parameter adaptif penuh
+
+    Parameters:
+    - img: numpy.ndarray, gambar yang akan di-enhance
+    - analysis: ImageAnalysis, opsional. Hasil analisis gambar resolusi
+      penuh; dipakai saat img adalah proxy preview agar keputusan sama
+      dengan render penuh.
+    - spatial_scale: float, skala img terhadap gambar penuh. Parameter
+      spasial (radius filter) diskalakan, params_used tetap skala penuh.
+    - runner: opsional, cara menjalankan tiap stage (lihat utils.tiles),
+      misalnya StripRunner untuk gambar besar dengan memori terbatas.
+    - denoise_budget_ms: float, opsional. Batas waktu denoise noise berat
+      untuk gambar resolusi penuh; backend NLM yang lebih cepat dipilih
+      jika NLM penuh diperkirakan melebihi batas (lihat
+      choose_denoise_backend). None = selalu NLM penuh.
+    - pool: ThreadPoolExecutor, opsional. Metrik analisis dihitung
+      paralel di pool ini (lihat utils.parallel).
+    - denoise_backend: str, opsional. Backend yang sudah dipilih pemanggil
+      (misalnya sebagai bagian dari kunci cache); jika diisi,
+      denoise_budget_ms diabaikan.
     """
-    result = img.copy()
+    run = runner or run_direct
+    # Tidak menyalin input: stage pertama menulis ke buffer output, stage
+    # berikutnya bekerja in-place di buffer yang sama jika memungkinkan.
+    result = img
+    out = np.empty_like(img)
     params_used = {}
     
     try:
-        # Analisis gambar
-        noise_std = estimate_noise(result)
-        brightness = analyze_brightness(result)
-        dynamic_range_info = analyze_dynamic_range(result)
-        cast_info = has_color_cast(result)
-        contrast_info = is_low_contrast(result)
-        sat_info = needs_saturation_boost(result)
-        blur_info = is_blurry(result)
+        # Analisis gambar (satu lintasan, data dasar dipakai bersama)
+        if analysis is None:
+            analysis = ImageAnalysis(result)
+        metrics = analysis.measure(pool)
+        noise_std = metrics['noise']
+        brightness = metrics['brightness']
+        dynamic_range_info = metrics['dynamic_range']
+        cast_info = metrics['color_cast']
+        contrast_info = metrics['contrast']
+        sat_info = metrics['saturation']
+        blur_info = metrics['blur']
         
         print(f"Image Analysis:")
         print(f"- Noise STD: {noise_std:.2f}")
@@ -365,41 +477,66 @@ def auto_enhance(img):
         # 3. White Balance
         if cast_info['has_cast']:
             print(f"Applying white balance (severity: {cast_info['severity']:.3f})")
-            result, wb_params = adaptive_white_balance(result, cast_info)
+            with timed('white_balance', result):
+                result, wb_params = run(adaptive_white_balance, result, 0, cast_info, dst=out)
             # Re-analyze after white balance
-            brightness = analyze_brightness(result)
+            with timed('analysis.brightness', result):
+                brightness = ImageAnalysis(result).brightness
             params_used.update(wb_params)
 
         # 2. Denoising
         if noise_std > 8:
             if noise_std > 25:
-                result = adaptive_denoise_nlm(result, noise_std)
-                # params_used.update(nlm_params)
+                # Pilihan backend berdasarkan ukuran resolusi penuh, sehingga
+                # preview memakai backend yang sama dengan render penuh
+                full_pixels = img.shape[0] * img.shape[1] / spatial_scale ** 2
+                backend = denoise_backend or choose_denoise_backend(full_pixels, denoise_budget_ms)
+                start = time.perf_counter()
+                with timed(f'denoise_{backend}', result):
+                    result, nlm_params = run(adaptive_denoise_nlm, result, nlm_halo(spatial_scale, backend),
+                                             noise_std, spatial_scale, backend)
+                if spatial_scale == 1.0:
+                    # Sekali per stage (bukan per strip); proxy preview memakai
+                    # jendela yang diperkecil sehingga tidak dicatat
+                    record_denoise_cost(backend, full_pixels, (time.perf_counter() - start) * 1000)
+                params_used.update(nlm_params)
             else:
-                result, bilateral_params = adaptive_denoise_bilateral(result, noise_std)
+                with timed('denoise_bilateral', result):
+                    result, bilateral_params = run(adaptive_denoise_bilateral, result,
+                                                   bilateral_halo(spatial_scale), noise_std, spatial_scale)
                 params_used.update(bilateral_params)
+            # Denoise tidak bisa in-place, hasilnya menjadi buffer output baru
+            out = result
     
 
         # 1. Gamma Correction (jika diperlukan untuk brightness)
-        result, gamma_params = gamma_correction_adaptive(result, brightness, dynamic_range_info)
+        with timed('gamma', result):
+            result, gamma_params = run(gamma_correction_adaptive, result, 0,
+                                       brightness, dynamic_range_info, dst=out)
         params_used.update(gamma_params)
         
         # 4. Contrast Enhancement
         if contrast_info['is_low']:
             print(f"Applying contrast enhancement (range: {contrast_info['range_contrast']:.3f})")
-            result, clahe_params = adaptive_contrast_clahe(result, contrast_info, brightness)
+            # CLAHE butuh histogram tile dari seluruh frame (stage global)
+            with timed('contrast', result):
+                result, clahe_params = run(adaptive_contrast_clahe, result, None,
+                                           contrast_info, brightness, dst=out)
             params_used.update(clahe_params)
 
         # 5. Saturation Enhancement
         if sat_info['needs_boost']:
             print(f"Applying saturation boost (mean_sat: {sat_info['mean_sat']:.1f})")
-            result, sat_params = adaptive_saturation_enhancement(result, sat_info)
+            with timed('saturation', result):
+                result, sat_params = run(adaptive_saturation_enhancement, result, 0, sat_info, dst=out)
             params_used.update(sat_params)
         
         # 6. Sharpening (terakhir)
         if blur_info['is_blurry']:
             print(f"Applying sharpening (blur_severity: {blur_info['blur_severity']:.3f})")
-            result, sharpen_params = adaptive_unsharp_masking(result, blur_info, noise_std)
+            with timed('sharpen', result):
+                result, sharpen_params = run(adaptive_unsharp_masking, result, sharpen_halo(spatial_scale),
+                                             blur_info, noise_std, spatial_scale, dst=out)
             params_used.update(sharpen_params)
         
         return result, params_used
@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+
+from utils.metrics import timed
+
+# ================= IMAGE CACHE =================
+
+class ImageCache:
+    """
+    LRU cache untuk gambar hasil decode (np.ndarray) dengan batas memori.
+
+    Entri dievict berdasarkan ukuran (nbytes) dari yang paling lama tidak
+    dipakai. Array yang disimpan dibuat read-only agar pemanggil tidak
+    mengubah isi cache secara tidak sengaja.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            img = self._entries.get(key)
+            if img is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return img
+
+    def put(self, key, img):
+        if img is None or img.nbytes > self.max_bytes:
+            return img
+        img.setflags(write=False)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+            self._entries[key] = img
+            self.current_bytes += img.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+        return img
+
+    def invalidate(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Ringkasan counter cache"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def load(self, key, path):
+        """Ambil gambar dari cache, decode dari disk jika belum ada"""
+        img = self.get(key)
+        if img is None:
+            with timed('decode'):
+                decoded = cv2.imread(path)
+            img = self.put(key, decoded)
+        return img
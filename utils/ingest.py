@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+import pillow_heif
+from PIL import Image
+
+from utils.metrics import timed
+
+# HEIC/HEIF dibuka lewat Image.open, langsung dari stream
+pillow_heif.register_heif_opener()
+
+# ================= INGEST UPLOAD =================
+
+def fit_size(size, max_size):
+    """Ukuran baru agar muat di max_size (rasio tetap), None jika sudah muat"""
+    width, height = size
+    max_width, max_height = max_size
+    if width > max_width or height > max_height:
+        ratio = min(max_width / width, max_height / height)
+        return int(width * ratio), int(height * ratio)
+    return None
+
+def to_bgr(image):
+    """PIL Image RGB ke array BGR OpenCV"""
+    return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+
+def decode_upload(stream, max_size, keep_full=False):
+    """
+    Decode upload langsung dari stream (JPEG, PNG, HEIC, dsb.) ke array
+    BGR yang sudah diperkecil agar muat di max_size.
+
+    Tanpa keep_full, JPEG di-decode dengan draft mode: libjpeg langsung
+    menghasilkan skala 1/2, 1/4, atau 1/8 yang masih >= ukuran target,
+    sehingga frame resolusi penuh tidak pernah dibuat. Format lain
+    diperkecil dulu dengan reduce() bilangan bulat (reducing_gap) sebelum
+    LANCZOS.
+
+    Returns: (resized, full). full adalah array resolusi penuh jika
+    keep_full dan gambar lebih besar dari max_size, selain itu None.
+    """
+    image = Image.open(stream)
+    target = fit_size(image.size, max_size)
+    with timed('upload_decode'):
+        if target is not None and not keep_full:
+            image.draft('RGB', target)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        else:
+            image.load()
+
+    full = None
+    if target is not None:
+        if keep_full:
+            full = to_bgr(image)
+        with timed('upload_resize'):
+            image = image.resize(target, Image.LANCZOS, reducing_gap=3.0)
+    return to_bgr(image), full
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+# ================= JOB QUEUE =================
+
+class QueueFull(Exception):
+    """Antrian job penuh; klien harus mencoba lagi nanti (HTTP 429)"""
+
+class JobQueue:
+    """
+    Antrian job in-process untuk enhancement yang lama.
+
+    Job dijalankan oleh sejumlah thread worker tetap (batas konkurensi
+    pekerjaan berat), sedangkan request handler hanya mendaftarkan job
+    dan langsung kembali. Jika job yang menunggu sudah max_pending,
+    submit menolak dengan QueueFull. Status job disimpan di memori proses
+    dan dihapus ttl_seconds setelah selesai.
+
+    Status: queued -> running -> done / error.
+    """
+
+    def __init__(self, workers=2, max_pending=16, ttl_seconds=600):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._jobs = {}         # job_id -> dict status
+        self._queue = deque()   # (job_id, fn, args, kwargs)
+        self._cond = threading.Condition()
+        self._pid = None
+
+    def submit(self, fn, *args, **kwargs):
+        """Daftarkan job baru dan kembalikan id-nya (QueueFull jika antrian penuh)"""
+        self._ensure_workers()
+        with self._cond:
+            self._purge()
+            if len(self._queue) >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(f"Antrian penuh ({self.max_pending} job menunggu)")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': 'queued',
+                'created': time.time(),
+                'started': None,
+                'finished': None,
+                'result': None,
+                'error': None
+            }
+            self._queue.append((job_id, fn, args, kwargs))
+            self._cond.notify_all()
+        return job_id
+
+    def get(self, job_id):
+        """Salinan status job (None jika tidak ada), dengan posisi antrian jika masih menunggu"""
+        with self._cond:
+            return self._snapshot(job_id)
+
+    def wait(self, job_id, status=None, timeout=15):
+        """
+        Tunggu sampai status job berbeda dari status (atau timeout), lalu
+        kembalikan salinan statusnya. Dipakai untuk server-sent events.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] != status:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._snapshot(job_id)
+
+    def _snapshot(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+        if job['status'] == 'queued':
+            job['position'] = next(i for i, entry in enumerate(self._queue) if entry[0] == job_id)
+        return job
+
+    def _run_worker(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job_id, fn, args, kwargs = self._queue.popleft()
+                job = self._jobs[job_id]
+                job['status'] = 'running'
+                job['started'] = time.time()
+                self._cond.notify_all()
+
+            try:
+                result, error = fn(*args, **kwargs), None
+            except Exception as e:
+                result, error = None, str(e)
+
+            with self._cond:
+                job['finished'] = time.time()
+                if error is None:
+                    job['status'] = 'done'
+                    job['result'] = result
+                    self.completed += 1
+                else:
+                    job['status'] = 'error'
+                    job['error'] = error
+                    self.failed += 1
+                self._cond.notify_all()
+
+    def _purge(self):
+        """Hapus job selesai yang sudah melewati TTL (lock sudah dipegang)"""
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished'] is not None and now - job['finished'] > self.ttl_seconds]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _ensure_workers(self):
+        """Jalankan thread worker (sekali per proses, aman setelah fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            for i in range(self.workers):
+                threading.Thread(target=self._run_worker, name=f"job-worker-{i}", daemon=True).start()
+            self._pid = os.getpid()
+
+    def stats(self):
+        with self._cond:
+            running = sum(1 for job in self._jobs.values() if job['status'] == 'running')
+            return {
+                'workers': self.workers,
+                'queued': len(self._queue),
+                'running': running,
+                'max_pending': self.max_pending,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected
+            }
@@ -0,0 +1,99 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# ================= HISTOGRAM =================
+
+# Batas bucket latency (detik), dari operasi LUT (~ms) sampai NLM (detik)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """
+    Histogram kumulatif format Prometheus dengan satu label.
+
+    Nilai disimpan per proses (tiap worker gunicorn punya histogram
+    sendiri), tanpa dependensi prometheus_client.
+    """
+
+    def __init__(self, name, help_text, label, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}   # nilai label -> [counts per bucket, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """Teks exposition format Prometheus untuk histogram ini"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, (counts, total, count) in sorted(self._series.items()):
+                label = f'{self.label}="{label_value}"'
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {bucket_count}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {count}')
+                lines.append(f'{self.name}_sum{{{label}}} {total:.6f}')
+                lines.append(f'{self.name}_count{{{label}}} {count}')
+        return "\n".join(lines) + "\n"
+
+STAGE_SECONDS = Histogram('image_enhancer_stage_duration_seconds',
+                          "Durasi decode, analisis, stage enhancement, encode, dan tulis disk",
+                          'stage')
+REQUEST_SECONDS = Histogram('image_enhancer_request_duration_seconds',
+                            "Durasi total request per endpoint",
+                            'endpoint')
+
+def render_metrics():
+    """Semua histogram dalam format teks Prometheus (endpoint /metrics)"""
+    return STAGE_SECONDS.render() + REQUEST_SECONDS.render()
+
+# ================= TIMING PER REQUEST =================
+
+# Daftar timing request yang sedang berjalan (None = tidak dikumpulkan)
+_current = ContextVar('timings', default=None)
+
+@contextmanager
+def collect_timings():
+    """
+    Kumpulkan timing semua operasi di dalam blok ini ke sebuah list
+    ({'name', 'ms', 'width', 'height'}) untuk dikembalikan di response.
+    """
+    timings = []
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def timed(name, img=None):
+    """
+    Ukur wall time sebuah operasi. Durasi selalu masuk histogram
+    /metrics, dan ke daftar timing request jika collect_timings aktif.
+    img (opsional) dipakai untuk mencatat dimensi gambar.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(name, elapsed)
+        timings = _current.get()
+        if timings is not None:
+            entry = {'name': name, 'ms': round(elapsed * 1000, 3)}
+            if img is not None:
+                entry['height'], entry['width'] = img.shape[:2]
+            timings.append(entry)
@@ -0,0 +1,56 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+# ================= THREAD POOL BERSAMA =================
+
+# Jumlah thread default: metrik analysis independen ada 8
+DEFAULT_THREADS = min(8, os.cpu_count() or 1)
+
+_threads = DEFAULT_THREADS
+_pool = None
+_pool_pid = None
+_lock = threading.Lock()
+
+def configure(threads=None, opencv_threads=None):
+    """
+    Atur jumlah thread pool bersama dan thread internal OpenCV.
+
+    Di bawah gunicorn dengan beberapa worker, total thread per mesin kira-
+    kira workers * threads * opencv_threads; batasi keduanya (misalnya
+    threads = jumlah core / jumlah worker, opencv_threads = 1) agar core
+    tidak oversubscribe. threads <= 1 = tanpa pool (semua serial).
+    opencv_threads None = biarkan default OpenCV.
+    """
+    global _threads, _pool
+    if threads is not None:
+        with _lock:
+            _threads = max(1, threads)
+            if _pool is not None and _pool_pid == os.getpid():
+                _pool.shutdown(wait=False)
+            _pool = None
+    if opencv_threads is not None:
+        cv2.setNumThreads(opencv_threads)
+
+def thread_count():
+    return _threads
+
+def get_pool():
+    """
+    ThreadPoolExecutor bersama per proses (dibuat saat pertama dipakai
+    dan dibuat ulang setelah fork). None jika dikonfigurasi satu thread.
+
+    Task di pool tidak boleh menunggu task lain di pool yang sama.
+    """
+    global _pool, _pool_pid
+    if _threads <= 1:
+        return None
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=_threads, thread_name_prefix="enhance")
+            _pool_pid = os.getpid()
+        return _pool
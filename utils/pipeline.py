@@ -0,0 +1,232 @@
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from utils.buffers import scratch
+from utils.enhance import (
+    denoise_bilateral,
+    white_balance_grayworld,
+    enhance_contrast_clahe,
+    enhance_saturation,
+    unsharp_masking,
+    gamma_correction,
+    clahe_l_channel,
+    scale_chroma_lab
+)
+from utils.metrics import timed
+from utils.pointops import PointOps
+from utils.tiles import gaussian_halo, run_direct
+
+# ================= MANUAL PIPELINE =================
+
+# Nilai default parameter manual (sama dengan default di route lama)
+MANUAL_DEFAULTS = {
+    'r_gain': 1.0,
+    'g_gain': 1.0,
+    'b_gain': 1.0,
+    'sigma_space': 3,
+    'sigma_color': 60,
+    'gamma': 1.0,
+    'clip_limit': 2.0,
+    'tile_grid': 8,
+    'saturation': 1.0,
+    'sharpen_radius': 1.0,
+    'sharpen_amount': 100
+}
+
+# Satu stage pipeline:
+# - name: nama stage
+# - params: parameter yang dipakai stage
+# - apply: fungsi (img, params, dst) -> img
+# - point: opsional, (PointOps, params) -> PointOps untuk operasi per-pixel
+#   yang bisa digabung menjadi satu LUT dengan stage titik di sekitarnya
+# - skip: opsional, params -> bool, True jika stage tidak mengubah gambar
+# - inplace: apakah dst boleh sama dengan img
+# - halo: params -> radius kernel stage (None = stage global, lihat utils.tiles)
+# - space: ruang warna kerja stage ('bgr', atau 'lab' jika apply sendiri
+#   mengonversi BGR -> LAB -> BGR)
+# - lab: opsional, (lab, params) -> lab, versi in-place pada buffer LAB;
+#   dipakai planner untuk menggabungkan stage setelah stage LAB
+Stage = namedtuple('Stage', ['name', 'params', 'apply', 'point', 'skip', 'inplace', 'halo', 'space', 'lab'],
+                   defaults=(None, None, True, lambda p: 0, 'bgr', None))
+
+MANUAL_STAGES = [
+    Stage('white_balance', ('r_gain', 'g_gain', 'b_gain'),
+          lambda img, p, dst=None: white_balance_grayworld(img, p['r_gain'], p['g_gain'], p['b_gain'], dst=dst),
+          point=lambda ops, p: ops.gains(p['r_gain'], p['g_gain'], p['b_gain'])),
+    Stage('denoise', ('sigma_space', 'sigma_color'),
+          lambda img, p, dst=None: denoise_bilateral(img, p['sigma_space'], p['sigma_color'], dst=dst),
+          skip=lambda p: p['sigma_space'] <= 0 and p['sigma_color'] <= 0,
+          inplace=False,
+          halo=lambda p: 9 // 2),
+    Stage('gamma', ('gamma',),
+          lambda img, p, dst=None: gamma_correction(img, p['gamma'], dst=dst),
+          point=lambda ops, p: ops.gamma(p['gamma'])),
+    Stage('contrast', ('clip_limit', 'tile_grid'),
+          lambda img, p, dst=None: enhance_contrast_clahe(img, p['clip_limit'], p['tile_grid'], dst=dst),
+          skip=lambda p: p['clip_limit'] <= 0,
+          halo=lambda p: None,
+          space='lab',
+          lab=lambda lab, p: clahe_l_channel(lab, p['clip_limit'], p['tile_grid'])),
+    Stage('saturation', ('saturation',),
+          lambda img, p, dst=None: enhance_saturation(img, p['saturation'], dst=dst),
+          lab=lambda lab, p: scale_chroma_lab(lab, p['saturation'])),
+    Stage('sharpen', ('sharpen_radius', 'sharpen_amount'),
+          lambda img, p, dst=None: unsharp_masking(img, radius=p['sharpen_radius'],
+                                                   amount=p['sharpen_amount'], dst=dst),
+          skip=lambda p: p['sharpen_radius'] <= 0.1 and p['sharpen_amount'] <= 0,
+          halo=lambda p: gaussian_halo(p['sharpen_radius']))
+]
+
+def parse_manual_params(data):
+    """Ambil parameter manual dari request JSON dengan tipe yang benar"""
+    params = {}
+    for key, default in MANUAL_DEFAULTS.items():
+        cast = int if key == 'tile_grid' else float
+        params[key] = cast(data.get(key, default))
+    return params
+
+# Satu langkah hasil perencanaan: satu stage, beberapa stage titik yang
+# digabung menjadi satu LUT, atau beberapa stage dalam satu buffer LAB.
+# - name: nama untuk timing (mis. white_balance+gamma)
+# - first, last: indeks stage pertama dan terakhir di MANUAL_STAGES
+# - apply: fungsi (img, dst) -> img
+# - space: 'lab' jika langkah menjalankan beberapa stage dalam satu buffer LAB
+Step = namedtuple('Step', ['name', 'first', 'last', 'apply', 'inplace', 'halo', 'space'])
+
+def plan_manual_stages(params, start=0, fuse_color=False):
+    """
+    Susun stage aktif mulai indeks start menjadi daftar Step.
+
+    Stage titik yang berurutan (misalnya white balance dan gamma ketika
+    denoise tidak aktif) digabung menjadi satu LUT; hasilnya identik.
+
+    Dengan fuse_color, planner melacak ruang warna buffer kerja: setelah
+    stage LAB (CLAHE), stage berikutnya yang punya versi LAB (saturasi
+    sebagai skala chroma) dijalankan pada buffer LAB yang sama, sehingga
+    hanya ada satu konversi BGR -> LAB dan satu LAB -> BGR, tanpa round
+    trip HSV. Saturasi chroma LAB tidak identik dengan skala S pada HSV,
+    karena itu opsional.
+    """
+    active = [i for i in range(start, len(MANUAL_STAGES))
+              if MANUAL_STAGES[i].skip is None or not MANUAL_STAGES[i].skip(params)]
+    steps = []
+    j = 0
+    while j < len(active):
+        first = active[j]
+        stage = MANUAL_STAGES[first]
+        group = [stage]
+        apply = lambda img, dst=None, stage=stage: stage.apply(img, params, dst=dst)
+        inplace, halo, space = stage.inplace, stage.halo(params), 'bgr'
+        if stage.point is not None:
+            while j + 1 < len(active) and MANUAL_STAGES[active[j + 1]].point is not None:
+                j += 1
+                group.append(MANUAL_STAGES[active[j]])
+            ops = PointOps()
+            for member in group:
+                member.point(ops, params)
+            apply = ops.apply
+        elif fuse_color and stage.space == 'lab':
+            while j + 1 < len(active) and MANUAL_STAGES[active[j + 1]].lab is not None:
+                j += 1
+                group.append(MANUAL_STAGES[active[j]])
+            if len(group) > 1:
+                apply = lambda img, dst=None, group=group: apply_in_lab(img, group, params, dst=dst)
+                halos = [member.halo(params) for member in group]
+                inplace, halo, space = True, None if None in halos else max(halos), 'lab'
+        steps.append(Step('+'.join(member.name for member in group), first, active[j],
+                          apply, inplace, halo, space))
+        j += 1
+    return steps
+
+def apply_in_lab(img, stages, params, dst=None):
+    """Jalankan beberapa stage pada satu buffer LAB: satu konversi masuk, satu keluar"""
+    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB, dst=scratch.get('lab', img.shape))
+    for stage in stages:
+        stage.lab(lab, params)
+    return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=dst)
+
+def stage_keys(image_key, params, fuse_color=False):
+    """
+    Kunci cache per stage. Kunci stage ke-i memuat parameter stage itu
+    dan semua stage sebelumnya, sehingga hanya prefix yang identik yang
+    dapat dipakai ulang. Hasil fuse_color ditandai terpisah karena
+    saturasinya berbeda.
+    """
+    keys = []
+    prefix = ()
+    for stage in MANUAL_STAGES:
+        prefix += tuple(params[n] for n in stage.params)
+        keys.append((image_key, stage.name, prefix) + (('lab',) if fuse_color else ()))
+    return keys
+
+def run_manual_pipeline(img, params, image_key=None, cache=None, runner=None, fuse_color=False,
+                        check=None):
+    """
+    Jalankan rantai enhancement manual secara inkremental.
+
+    Jika cache (ImageCache) dan image_key diberikan, hasil setiap stage
+    disimpan dan request berikutnya hanya menjalankan ulang stage mulai
+    dari parameter pertama yang berubah.
+
+    Stage direncanakan oleh plan_manual_stages: stage titik yang
+    berurutan digabung menjadi satu LUT, dan dengan fuse_color stage
+    setelah CLAHE dijalankan di buffer LAB yang sama.
+
+    Tanpa cache, semua stage menulis ke satu buffer output yang sama
+    (in-place jika memungkinkan) sehingga tidak ada salinan per stage.
+    Dengan cache, setiap hasil stage harus berupa array baru karena
+    disimpan.
+
+    runner menentukan cara menjalankan tiap stage (default satu frame
+    penuh; StripRunner untuk gambar besar per strip).
+
+    check (opsional) dipanggil sebelum setiap stage dan boleh melempar
+    exception untuk membatalkan render, misalnya Superseded dari
+    RenderSlots. Hasil stage yang sudah selesai tetap ada di cache.
+    """
+    run = runner or run_direct
+    start = 0
+    keys = None
+    if cache is not None and image_key is not None:
+        keys = stage_keys(image_key, params, fuse_color)
+        # Hasil di tengah grup LAB tidak dipakai: tanpa fuse_color
+        # stage berikutnya akan dijalankan lewat HSV
+        inside_group = set()
+        for step in plan_manual_stages(params, fuse_color=fuse_color):
+            if step.space == 'lab':
+                inside_group.update(range(step.first, step.last))
+        for i in range(len(MANUAL_STAGES) - 1, -1, -1):
+            if i in inside_group:
+                continue
+            cached = cache.get(keys[i])
+            if cached is not None:
+                img = cached
+                start = i + 1
+                break
+
+    out = None
+    for step in plan_manual_stages(params, start, fuse_color):
+        if check is not None:
+            check()
+        dst = None
+        if keys is None and step.inplace:
+            if out is None:
+                out = np.empty_like(img)
+            dst = out
+
+        # Stage gabungan dicatat sebagai satu timing, mis. white_balance+gamma
+        with timed(step.name, img):
+            result = run(step.apply, img, step.halo, dst=dst)
+        img = store(result, img, keys, step.last, cache)
+        if keys is None and not step.inplace:
+            out = img
+
+    return img
+
+def store(result, source, keys, i, cache):
+    """Simpan hasil stage ke cache (kecuali stage tidak mengubah gambar)"""
+    if keys is not None and result is not source:
+        cache.put(keys[i], result)
+    return result
@@ -0,0 +1,96 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# ================= POINT OPERATIONS (LUT) =================
+
+IDENTITY_TABLE = np.arange(256, dtype=np.uint8)
+
+# Jumlah tabel per jenis yang disimpan (LRU). Nilai slider berulang terus,
+# nilai adaptif (gain white balance) jarang sama dan cukup tergeser keluar.
+TABLE_CACHE_SIZE = 256
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def gain_table(gain):
+    """
+    Tabel 256 entri untuk perkalian gain pada satu kanal.
+
+    Aritmetika float32 + clip + truncation sama persis dengan versi
+    split/multiply/merge sebelumnya, sehingga hasilnya identik.
+    Tabel di-cache per nilai gain dan read-only (dipakai bersama).
+    """
+    table = np.arange(256, dtype=np.float32)
+    table *= gain
+    table = np.clip(table, 0, 255).astype(np.uint8)
+    table.setflags(write=False)
+    return table
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def gamma_table(gamma):
+    """Tabel 256 entri untuk gamma correction (di-cache per nilai gamma, read-only)"""
+    table = (((np.arange(256) / 255.0) ** gamma) * 255).astype(np.uint8)
+    table.setflags(write=False)
+    return table
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def chroma_table(scale):
+    """Tabel (1, 256, 3) untuk buffer LAB: L identitas, a/b diskalakan terhadap 128 (read-only)"""
+    chroma = np.clip(np.rint((IDENTITY_TABLE - 128.0) * scale + 128), 0, 255).astype(np.uint8)
+    table = np.stack([IDENTITY_TABLE, chroma, chroma], axis=1).reshape(1, 256, 3)
+    table.setflags(write=False)
+    return table
+
+def table_cache_stats():
+    stats = {}
+    for name, fn in (('gain', gain_table), ('gamma', gamma_table), ('chroma', chroma_table)):
+        info = fn.cache_info()
+        stats[name] = {'entries': info.currsize, 'max_entries': info.maxsize,
+                       'hits': info.hits, 'misses': info.misses}
+    return stats
+
+class PointOps:
+    """
+    Penyusun operasi titik (per-pixel) menjadi satu LUT per kanal.
+
+    Operasi yang berurutan dikomposisikan pada tabel 256 entri (bukan
+    pada gambar), lalu diterapkan sekali dengan cv2.LUT. Karena setiap
+    tabel sudah dikuantisasi ke uint8, hasil komposisi identik dengan
+    menerapkan operasi satu per satu.
+    """
+
+    def __init__(self):
+        # Tabel (256, 3) dalam urutan kanal BGR, None = identitas
+        self.table = None
+
+    def then(self, table):
+        """Tambahkan tabel (256,) untuk semua kanal atau (256, 3) per kanal"""
+        table = np.asarray(table, dtype=np.uint8)
+        if table.ndim == 1:
+            table = np.repeat(table[:, None], 3, axis=1)
+        if self.table is None:
+            self.table = table.copy()
+        else:
+            for c in range(3):
+                self.table[:, c] = table[self.table[:, c], c]
+        return self
+
+    def gains(self, r_gain=1.0, g_gain=1.0, b_gain=1.0):
+        table = np.stack([gain_table(b_gain), gain_table(g_gain), gain_table(r_gain)], axis=1)
+        return self.then(table)
+
+    def gamma(self, gamma):
+        return self.then(gamma_table(gamma))
+
+    @property
+    def is_identity(self):
+        return self.table is None or np.array_equal(self.table, np.repeat(IDENTITY_TABLE[:, None], 3, axis=1))
+
+    def apply(self, img, dst=None):
+        """Terapkan LUT gabungan dalam satu lintasan (dst boleh sama dengan img)"""
+        if self.is_identity:
+            return img
+        table = self.table
+        if np.array_equal(table[:, 0], table[:, 1]) and np.array_equal(table[:, 0], table[:, 2]):
+            return cv2.LUT(img, np.ascontiguousarray(table[:, 0]), dst=dst)
+        return cv2.LUT(img, table.reshape(1, 256, 3), dst=dst)
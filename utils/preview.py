@@ -0,0 +1,40 @@
+import cv2
+
+# ================= PREVIEW (PROXY) =================
+
+# Panjang sisi terpanjang gambar proxy untuk live preview
+PREVIEW_LONG_EDGE = 640
+
+# Parameter manual yang diukur dalam pixel dan harus ikut diskalakan
+SPATIAL_PARAMS = ('sigma_space', 'sharpen_radius')
+
+def make_proxy(img, long_edge=PREVIEW_LONG_EDGE):
+    """
+    Perkecil gambar sehingga sisi terpanjang = long_edge.
+
+    Returns:
+    - proxy: numpy.ndarray, gambar proxy (gambar asli jika sudah kecil)
+    - scale: float, rasio ukuran proxy terhadap gambar asli
+    """
+    h, w = img.shape[:2]
+    scale = long_edge / max(h, w)
+    if scale >= 1.0:
+        return img, 1.0
+
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA), scale
+
+def scale_manual_params(params, scale):
+    """
+    Sesuaikan parameter spasial dengan skala proxy.
+
+    tile_grid CLAHE adalah jumlah tile (bukan ukuran dalam pixel), jadi
+    pembagian tile relatif terhadap gambar sudah sama dan tidak diubah.
+    """
+    if scale == 1.0:
+        return params
+
+    scaled = dict(params)
+    for key in SPATIAL_PARAMS:
+        scaled[key] = params[key] * scale
+    return scaled
@@ -0,0 +1,90 @@
+import threading
+from contextlib import contextmanager
+
+# ================= RENDER SLOT PER GAMBAR =================
+
+class Superseded(Exception):
+    """Render digantikan request yang lebih baru untuk gambar yang sama (HTTP 409)"""
+
+class RenderSlots:
+    """
+    Satu slot render per kunci (misalnya filename + mode preview).
+
+    Setiap request yang masuk menaikkan generasi slot-nya, sehingga
+    request yang lebih lama langsung kalah: yang masih menunggu slot
+    dibatalkan sebelum mulai, dan yang sedang berjalan dibatalkan pada
+    pemeriksaan berikutnya (antar stage pipeline). Hanya satu render per
+    slot yang berjalan pada satu waktu, jadi geseran slider yang cepat
+    memakai CPU kira-kira satu render, bukan satu render per geseran.
+
+    Slot berada di memori proses; request untuk gambar yang sama di
+    worker gunicorn lain tidak saling membatalkan.
+    """
+
+    def __init__(self):
+        self.completed = 0
+        self.superseded_queued = 0
+        self.superseded_running = 0
+        self._slots = {}    # key -> {'generation', 'busy', 'waiters'}
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, key):
+        """
+        Tunggu slot untuk key lalu jalankan isi blok. Yield fungsi check()
+        yang melempar Superseded jika sudah ada request lebih baru; blok
+        juga bisa gagal dengan Superseded sebelum mulai.
+        """
+        with self._cond:
+            slot = self._slots.setdefault(key, {'generation': 0, 'busy': False, 'waiters': 0})
+            slot['generation'] += 1
+            generation = slot['generation']
+            # Bangunkan request lama yang menunggu agar segera mundur
+            self._cond.notify_all()
+            slot['waiters'] += 1
+            try:
+                while slot['busy'] and slot['generation'] == generation:
+                    self._cond.wait()
+            finally:
+                slot['waiters'] -= 1
+            if slot['generation'] != generation:
+                self.superseded_queued += 1
+                self._release(key, slot, busy=False)
+                raise Superseded("Render digantikan parameter yang lebih baru")
+            slot['busy'] = True
+
+        def check():
+            # Baca tanpa lock: generasi hanya bertambah
+            if slot['generation'] != generation:
+                raise Superseded("Render digantikan parameter yang lebih baru")
+
+        try:
+            yield check
+        except Superseded:
+            with self._cond:
+                self.superseded_running += 1
+            raise
+        else:
+            with self._cond:
+                self.completed += 1
+        finally:
+            with self._cond:
+                self._release(key, slot, busy=True)
+
+    def _release(self, key, slot, busy):
+        """Lepas slot (lock sudah dipegang); hapus jika tidak ada yang memakai"""
+        if busy:
+            slot['busy'] = False
+            self._cond.notify_all()
+        if not slot['busy'] and slot['waiters'] == 0 and self._slots.get(key) is slot:
+            del self._slots[key]
+
+    def stats(self):
+        with self._cond:
+            return {
+                'active': sum(1 for slot in self._slots.values() if slot['busy']),
+                'waiting': sum(slot['waiters'] for slot in self._slots.values()),
+                'completed': self.completed,
+                'superseded_queued': self.superseded_queued,
+                'superseded_running': self.superseded_running
+            }
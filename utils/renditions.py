@@ -0,0 +1,87 @@
+from collections import namedtuple
+from contextvars import copy_context
+
+import cv2
+
+from utils.metrics import timed
+from utils.preview import make_proxy
+
+# ================= ENCODE & RENDITION =================
+
+# Format hasil: (ekstensi cv2.imencode, mimetype, flag kualitas)
+IMAGE_FORMATS = {
+    'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY)
+}
+DEFAULT_QUALITY = 95  # Sama dengan default cv2.imwrite untuk JPEG
+
+# Rendition tambahan yang bisa diminta; 'full' selalu ada (hasil utama)
+RENDITION_NAMES = ('display', 'thumbnail')
+
+# Satu versi hasil:
+# - name: full, display, atau thumbnail
+# - long_edge: sisi terpanjang maksimum (None = ukuran penuh)
+# - fmt, quality: format (kunci IMAGE_FORMATS) dan kualitas encode
+# - progressive: JPEG progressive (diabaikan untuk WebP)
+Rendition = namedtuple('Rendition', ['name', 'long_edge', 'fmt', 'quality', 'progressive'])
+
+def encode_image(image, fmt='jpeg', quality=DEFAULT_QUALITY, progressive=False):
+    """Encode gambar ke bytes (np.ndarray) dengan cv2.imencode"""
+    ext, _, quality_flag = IMAGE_FORMATS[fmt]
+    flags = [quality_flag, quality]
+    if progressive and fmt == 'jpeg':
+        flags += [cv2.IMWRITE_JPEG_PROGRESSIVE, 1]
+    with timed('encode', image):
+        ok, encoded = cv2.imencode(ext, image, flags)
+    if not ok:
+        raise ValueError(f"Gagal encode gambar ke {fmt}")
+    return encoded
+
+def parse_rendition_names(value):
+    """
+    Nama rendition tambahan dari form/JSON: list atau string dipisah koma
+    (mis. "display,thumbnail"). 'full' boleh disebut tetapi selalu ada.
+    Returns: tuple nama unik dengan urutan RENDITION_NAMES (urutan request
+    tidak memengaruhi kunci cache), ValueError jika tidak dikenal.
+    """
+    if not value:
+        return ()
+    if isinstance(value, str):
+        value = value.split(',')
+    names = set()
+    for name in value:
+        name = str(name).strip().lower()
+        if not name or name == 'full':
+            continue
+        if name not in RENDITION_NAMES:
+            raise ValueError(f"Rendition tidak dikenal: {name}")
+        names.add(name)
+    return tuple(name for name in RENDITION_NAMES if name in names)
+
+def is_downscaled(spec, shape):
+    """
+    True jika rendition lebih kecil dari gambar berukuran shape. Rendition
+    lain (misalnya display dari proxy preview 640 px) berisi pixel yang
+    sama dengan hasil utama, jadi tidak perlu di-encode terpisah.
+    """
+    return spec.long_edge is not None and spec.long_edge < max(shape[:2])
+
+def render_rendition(img, spec):
+    """Perkecil (INTER_AREA) lalu encode satu rendition; kembalikan (spec, encoded, (h, w))"""
+    if spec.long_edge is not None:
+        with timed('resize', img):
+            img = make_proxy(img, spec.long_edge)[0]
+    return spec, encode_image(img, spec.fmt, spec.quality, spec.progressive), img.shape[:2]
+
+def render_renditions(img, specs, pool=None):
+    """
+    Semua rendition dari satu buffer hasil enhancement, urut sesuai specs.
+
+    Resize dan encode setiap rendition independen dan melepas GIL,
+    sehingga dijalankan paralel di pool (lihat utils.parallel) jika ada.
+    """
+    if pool is None or len(specs) < 2:
+        return [render_rendition(img, spec) for spec in specs]
+    # copy_context agar timing tetap tercatat di request yang sama
+    futures = [pool.submit(copy_context().run, render_rendition, img, spec) for spec in specs]
+    return [future.result() for future in futures]
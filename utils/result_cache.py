@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: lock hanya antar thread
+    fcntl = None
+
+# ================= RESULT CACHE =================
+
+# Naikkan jika algoritma enhancement berubah agar hasil lama tidak dipakai
+CACHE_VERSION = 2
+
+# Suffix file cache (sebelum ekstensi); tidak termasuk RESULT_SUFFIXES
+# sehingga tidak ikut dihapus oleh sweep ResultStore
+CACHE_SUFFIX = '_cached'
+
+def cache_key(*parts):
+    """Kunci cache dari bagian-bagian yang bisa di-JSON-kan (urutan dict tidak berpengaruh)"""
+    canonical = json.dumps([CACHE_VERSION, *parts], sort_keys=True, separators=(',', ':'), default=float)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:40]
+
+def file_digest(path):
+    """SHA-256 isi file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    Cache hasil enhancement di disk yang dialamatkan dengan isi.
+
+    Kunci adalah hash dari isi gambar sumber dan parameter kanonik
+    (lihat cache_key), sehingga gambar yang sama dengan parameter yang
+    sama tidak dihitung ulang, termasuk setelah upload ulang file yang
+    identik. Hasil ter-encode disimpan sebagai <kunci>_cached.<ext> di
+    folder upload (bisa langsung disajikan), metadata seperti
+    params_used di <kunci>_cached.json.
+
+    Total ukuran dibatasi max_bytes untuk semua worker bersama: sebelum
+    evict, isi folder dipindai ulang di bawah flock, dan urutan LRU
+    diambil dari mtime (diperbarui setiap hit). Entri yang dipakai dalam
+    min_age detik terakhir tidak dihapus, agar filename yang baru saja
+    dikembalikan worker lain masih bisa diunduh.
+    """
+
+    def __init__(self, folder, max_bytes=512 * 1024 * 1024, min_age=60):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _path(self, filename):
+        return os.path.join(self.folder, filename)
+
+    def _meta_path(self, filename):
+        return self._path(os.path.splitext(filename)[0] + '.json')
+
+    def _size(self, filename):
+        size = os.path.getsize(self._path(filename))
+        if os.path.exists(self._meta_path(filename)):
+            size += os.path.getsize(self._meta_path(filename))
+        return size
+
+    def _scan(self):
+        """Entri di disk (semua worker): list (mtime, filename, ukuran) urut dari yang paling lama dipakai"""
+        found = []
+        with os.scandir(self.folder) as it:
+            for item in it:
+                stem, ext = os.path.splitext(item.name)
+                if stem.endswith(CACHE_SUFFIX) and ext != '.json':
+                    try:
+                        found.append((item.stat().st_mtime, item.name, self._size(item.name)))
+                    except OSError:
+                        pass
+        return sorted(found)
+
+    @contextmanager
+    def _locked(self):
+        """Lock antar thread, dan antar proses dengan flock jika tersedia"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._path('result_cache.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    @staticmethod
+    def filename(key, ext):
+        return f"{key}{CACHE_SUFFIX}{ext}"
+
+    def get(self, key, ext, read=False):
+        """
+        Kembalikan (filename, metadata) jika ada di cache, selain itu None.
+        Dengan read=True kembalikan (filename, metadata, bytes): isi file
+        dibaca di sini, sehingga entri yang di-evict di antaranya menjadi
+        miss, bukan error.
+        """
+        filename = self.filename(key, ext)
+        try:
+            with open(self._meta_path(filename)) as f:
+                meta = json.load(f)
+            # mtime sebagai urutan LRU bersama antar worker
+            os.utime(self._path(filename))
+            if read:
+                with open(self._path(filename), 'rb') as f:
+                    data = f.read()
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return (filename, meta, data) if read else (filename, meta)
+
+    def put(self, key, ext, data, meta=None):
+        """Simpan hasil ter-encode (bytes/ndarray) beserta metadata; kembalikan filename"""
+        # Tulis ke file sementara lalu rename agar pembaca tidak melihat file setengah jadi
+        tmp = f"{self._path(self.filename(key, ext))}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        return self.adopt(key, ext, tmp, meta)
+
+    def adopt(self, key, ext, source_path, meta=None):
+        """Pindahkan file hasil yang sudah ada (di filesystem yang sama) ke cache"""
+        filename = self.filename(key, ext)
+        os.replace(source_path, self._path(filename))
+        # Metadata ditulis terakhir karena menandai entri lengkap
+        meta_tmp = f"{self._meta_path(filename)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(meta_tmp, 'w') as f:
+            json.dump(meta or {}, f, default=float)
+        os.replace(meta_tmp, self._meta_path(filename))
+        self._evict(keep=filename)
+        return filename
+
+    def _evict(self, keep):
+        """Hapus entri LRU (dari semua worker) sampai total muat max_bytes"""
+        with self._locked():
+            entries = self._scan()
+            total = sum(size for _, _, size in entries)
+            recent = time.time() - self.min_age
+            for mtime, filename, size in entries:
+                if total <= self.max_bytes or mtime > recent:
+                    break
+                if filename == keep:
+                    continue
+                self._remove(filename)
+                total -= size
+                self.evictions += 1
+
+    def _remove(self, filename):
+        # Metadata dihapus lebih dulu sehingga entri langsung dianggap tidak ada
+        for path in (self._meta_path(filename), self._path(filename)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        entries = self._scan()
+        with self._lock:
+            return {
+                'entries': len(entries),
+                'bytes': sum(size for _, _, size in entries),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# ================= RESULT STORE =================
+
+# Suffix file hasil yang boleh dihapus oleh sweep folder (bukan original),
+# termasuk rendition tambahan (<jenis>_display.webp, dsb.)
+RESULT_SUFFIXES = ('_auto.jpg', '_manual.jpg', '_preview.jpg', '_batch.jpg',
+                   '_display.jpg', '_display.webp', '_thumbnail.jpg', '_thumbnail.webp')
+
+class ResultStore:
+    """
+    Indeks file hasil enhancement di folder upload.
+
+    Setiap hasil dicatat bersama pemiliknya (nama file original) dan
+    jenisnya (auto/manual/preview/batch). Hasil baru dengan pemilik dan
+    jenis yang sama menggantikan hasil sebelumnya. Request handler hanya
+    melakukan pencatatan O(1); penghapusan file dilakukan oleh thread
+    janitor di background berdasarkan TTL dan batas ukuran total.
+    """
+
+    def __init__(self, folder, ttl_seconds=3600, max_bytes=1024 * 1024 * 1024,
+                 interval=30, sweep_every=20):
+        self.folder = folder
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.sweep_every = sweep_every
+        self.current_bytes = 0
+        self.removed = 0
+        self._entries = OrderedDict()   # filename -> (created, size, (owner, kind))
+        self._latest = {}               # (owner, kind) -> filename
+        self._trash = []                # file yang sudah diganti, menunggu dihapus
+        self._lock = threading.Lock()
+        self._janitor = None
+        self._janitor_pid = None
+
+    def register(self, owner, filename, kind):
+        """Catat file hasil baru; hasil lama (owner, kind) dijadwalkan dihapus"""
+        path = os.path.join(self.folder, filename)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        with self._lock:
+            previous = self._latest.get((owner, kind))
+            self._latest[(owner, kind)] = filename
+            if previous is not None and previous in self._entries:
+                self._drop(previous)
+            self._entries[filename] = (time.time(), size, (owner, kind))
+            self.current_bytes += size
+        self.ensure_janitor()
+        return filename
+
+    def _drop(self, filename):
+        """Keluarkan dari indeks dan masukkan ke antrian hapus (lock sudah dipegang)"""
+        _, size, key = self._entries.pop(filename)
+        self.current_bytes -= size
+        if self._latest.get(key) == filename:
+            del self._latest[key]
+        self._trash.append(filename)
+
+    def collect(self):
+        """Tentukan file yang harus dihapus: diganti, kedaluwarsa, atau melebihi batas ukuran"""
+        now = time.time()
+        with self._lock:
+            # Entri urut berdasarkan waktu dibuat, cukup periksa dari depan
+            while self._entries:
+                filename, (created, _, _) = next(iter(self._entries.items()))
+                if now - created <= self.ttl_seconds and self.current_bytes <= self.max_bytes:
+                    break
+                self._drop(filename)
+            trash, self._trash = self._trash, []
+        return trash
+
+    def cleanup(self):
+        """Hapus file yang sudah tidak dipakai (dipanggil oleh janitor)"""
+        for filename in self.collect():
+            try:
+                os.remove(os.path.join(self.folder, filename))
+                self.removed += 1
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Error deleting {filename}: {e}")
+
+    def sweep(self):
+        """
+        Hapus file hasil lama yang tidak tercatat di indeks proses ini
+        (milik worker lain atau dari sebelum restart) berdasarkan mtime.
+        """
+        now = time.time()
+        with self._lock:
+            tracked = set(self._entries)
+        for fname in os.listdir(self.folder):
+            if not fname.endswith(RESULT_SUFFIXES) or fname in tracked:
+                continue
+            path = os.path.join(self.folder, fname)
+            try:
+                if now - os.path.getmtime(path) > self.ttl_seconds:
+                    os.remove(path)
+                    self.removed += 1
+            except OSError:
+                pass
+
+    def _run_janitor(self):
+        rounds = 0
+        while True:
+            time.sleep(self.interval)
+            self.cleanup()
+            rounds += 1
+            if rounds % self.sweep_every == 0:
+                self.sweep()
+
+    def ensure_janitor(self):
+        """Jalankan thread janitor (sekali per proses, aman setelah fork)"""
+        if self._janitor_pid == os.getpid():
+            return
+        with self._lock:
+            if self._janitor_pid == os.getpid():
+                return
+            self._janitor = threading.Thread(target=self._run_janitor, name="result-janitor", daemon=True)
+            self._janitor.start()
+            self._janitor_pid = os.getpid()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'pending_delete': len(self._trash),
+                'removed': self.removed
+            }
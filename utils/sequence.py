@@ -0,0 +1,287 @@
+"""
+Enhancement video atau burst gambar (urutan frame) dengan parameter
+yang stabil antar frame.
+
+Contoh CLI:
+    python -m utils.sequence video.mp4 hasil.mp4
+    python -m utils.sequence "burst/IMG_%04d.jpg" "hasil/IMG_%04d.jpg"
+    python -m utils.sequence video.mp4 hasil.avi --fourcc MJPG --keyframe-interval 30
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+
+import cv2
+
+from utils.analysis import analyze_proxy
+from utils.enhance import auto_enhance
+from utils.pipeline import MANUAL_DEFAULTS, run_manual_pipeline
+from utils.preview import make_proxy
+
+# ================= PARAMETER KEYFRAME =================
+
+# Parameter yang dihaluskan antar keyframe dan nilainya jika stage tidak
+# dipilih auto_enhance (stage tidak mengubah gambar)
+SMOOTHED_PARAMS = {
+    'r_gain': 1.0,
+    'g_gain': 1.0,
+    'b_gain': 1.0,
+    'sigma_space': 0.0,
+    'sigma_color': 0.0,
+    'gamma': 1.0,
+    'clip_limit': 0.0,
+    'saturation': 1.0,
+    'sharpen_radius': 0.0,
+    'sharpen_amount': 0.0
+}
+
+# Di bawah nilai ini (setelah dihaluskan) stage dimatikan, agar stage yang
+# memudar tidak dijalankan dengan kekuatan hampir nol
+MIN_SIGMA_COLOR = 10.0
+MIN_CLIP_LIMIT = 0.5
+MIN_SHARPEN_AMOUNT = 10.0
+
+# Denoise NLM terlalu lambat untuk setiap frame; pipeline manual hanya
+# punya bilateral, dipakai dengan parameter bilateral terkuat
+NLM_AS_BILATERAL = {'sigma_space': 90, 'sigma_color': 90}
+
+def keyframe_params(frame):
+    """
+    Parameter manual dari keputusan auto_enhance untuk satu keyframe.
+
+    Analisis memakai analyze_proxy (biaya hampir konstan terhadap ukuran
+    frame), dan auto_enhance dijalankan pada proxy kecil hanya untuk
+    mendapatkan params_used dalam skala penuh. Stage yang tidak dipilih
+    bernilai netral (lihat SMOOTHED_PARAMS).
+    """
+    proxy, scale = make_proxy(frame)
+    _, params_used = auto_enhance(proxy, analysis=analyze_proxy(frame), spatial_scale=scale)
+    params = {key: params_used.get(key, neutral) for key, neutral in SMOOTHED_PARAMS.items()}
+    params['tile_grid'] = params_used.get('tile_grid')
+    if 'denoise_backend' in params_used and 'sigma_color' not in params_used:
+        params.update(NLM_AS_BILATERAL)
+    return params
+
+class ParamSmoother:
+    """
+    Haluskan parameter keyframe dengan exponential moving average.
+
+    Auto enhance per frame bisa memilih cabang berbeda dari frame ke frame
+    (misalnya CLAHE aktif lalu tidak), yang terlihat sebagai flicker. Di
+    sini setiap keyframe hanya menggeser parameter sebesar alpha ke arah
+    hasil keyframe, dan frame di antara keyframe memakai parameter tetap.
+    tile_grid (jumlah tile) tidak dihaluskan: dipakai nilai keyframe
+    terakhir yang menjalankan CLAHE.
+    """
+
+    def __init__(self, alpha=0.5):
+        self.alpha = alpha
+        self.state = None
+        self.tile_grid = MANUAL_DEFAULTS['tile_grid']
+
+    def update(self, target):
+        """Masukkan parameter keyframe baru; kembalikan parameter manual hasil penghalusan"""
+        if target.get('tile_grid') is not None:
+            self.tile_grid = target['tile_grid']
+        if self.state is None:
+            self.state = {key: float(target[key]) for key in SMOOTHED_PARAMS}
+        else:
+            for key in SMOOTHED_PARAMS:
+                self.state[key] += self.alpha * (target[key] - self.state[key])
+        return self.params()
+
+    def params(self):
+        """Parameter manual lengkap (format parse_manual_params) dari state saat ini"""
+        params = dict(self.state, tile_grid=self.tile_grid)
+        if params['sigma_color'] < MIN_SIGMA_COLOR:
+            params['sigma_space'] = params['sigma_color'] = 0.0
+        if params['clip_limit'] < MIN_CLIP_LIMIT:
+            params['clip_limit'] = 0.0
+        if params['sharpen_amount'] < MIN_SHARPEN_AMOUNT:
+            params['sharpen_radius'] = params['sharpen_amount'] = 0.0
+        return params
+
+# ================= PIPELINE DECODE -> ENHANCE -> ENCODE =================
+
+_DONE = object()
+
+def _put(q, item, stop):
+    """put yang berhenti jika stage lain gagal (tidak menunggu selamanya)"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _DONE
+
+class FrameWriter:
+    """Tulis frame ke video (VideoWriter) atau ke pola file gambar jika output berisi '%'"""
+
+    def __init__(self, output, fps, fourcc='mp4v'):
+        self.output = output
+        self.fps = fps
+        self.fourcc = fourcc
+        self.count = 0
+        self._writer = None
+
+    def write(self, frame):
+        if '%' in self.output:
+            if not cv2.imwrite(self.output % self.count, frame):
+                raise OSError(f"Gagal menyimpan {self.output % self.count}")
+        else:
+            if self._writer is None:
+                h, w = frame.shape[:2]
+                self._writer = cv2.VideoWriter(self.output, cv2.VideoWriter_fourcc(*self.fourcc),
+                                               self.fps, (w, h))
+                if not self._writer.isOpened():
+                    raise OSError(f"Tidak dapat membuat video {self.output} (fourcc {self.fourcc})")
+            self._writer.write(frame)
+        self.count += 1
+
+    def release(self):
+        if self._writer is not None:
+            self._writer.release()
+
+def enhance_sequence(source, output, keyframe_interval=15, alpha=0.5, fourcc='mp4v', fps=None,
+                     queue_size=4):
+    """
+    Enhance semua frame dari source (file video atau pola burst seperti
+    IMG_%04d.jpg, dibuka dengan cv2.VideoCapture) ke output.
+
+    Hanya setiap keyframe_interval frame yang dianalisis (keyframe_params);
+    parameternya dihaluskan dengan ParamSmoother lalu dipakai tetap untuk
+    frame berikutnya lewat pipeline manual. Decode, enhance, dan encode
+    berjalan di thread masing-masing dengan antrian terbatas (queue_size
+    frame), sehingga ketiganya tumpang tindih (OpenCV melepas GIL) dan
+    throughput mendekati stage paling lambat.
+
+    Returns: dict ringkasan (jumlah frame, keyframe, fps, waktu sibuk per
+    stage, dan parameter terakhir).
+    """
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Tidak dapat membuka {source}")
+    fps = fps or capture.get(cv2.CAP_PROP_FPS) or 25.0
+    writer = FrameWriter(output, fps, fourcc)
+    smoother = ParamSmoother(alpha)
+
+    decoded = queue.Queue(maxsize=queue_size)
+    enhanced = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    busy = {'decode': 0.0, 'enhance': 0.0, 'encode': 0.0}
+    keyframes = []
+
+    def stage(name, fn):
+        def run():
+            try:
+                fn()
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                stop.set()
+        return threading.Thread(target=run, name=f"sequence-{name}", daemon=True)
+
+    def decode():
+        index = 0
+        while True:
+            start = time.perf_counter()
+            ok, frame = capture.read()
+            busy['decode'] += time.perf_counter() - start
+            if not ok:
+                break
+            if not _put(decoded, (index, frame), stop):
+                return
+            index += 1
+        _put(decoded, _DONE, stop)
+
+    def enhance():
+        params = None
+        while True:
+            item = _get(decoded, stop)
+            if item is _DONE:
+                break
+            index, frame = item
+            start = time.perf_counter()
+            if index % keyframe_interval == 0:
+                params = smoother.update(keyframe_params(frame))
+                keyframes.append(index)
+            result = run_manual_pipeline(frame, params)
+            busy['enhance'] += time.perf_counter() - start
+            if not _put(enhanced, result, stop):
+                return
+        _put(enhanced, _DONE, stop)
+
+    def encode():
+        while True:
+            frame = _get(enhanced, stop)
+            if frame is _DONE:
+                break
+            start = time.perf_counter()
+            writer.write(frame)
+            busy['encode'] += time.perf_counter() - start
+
+    started = time.perf_counter()
+    threads = [stage('decode', decode), stage('enhance', enhance), stage('encode', encode)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        capture.release()
+        writer.release()
+    elapsed = time.perf_counter() - started
+
+    if errors:
+        raise RuntimeError("; ".join(errors))
+    return {
+        'source': source,
+        'output': output,
+        'frames': writer.count,
+        'keyframes': len(keyframes),
+        'seconds': elapsed,
+        'fps': writer.count / elapsed if elapsed > 0 else 0.0,
+        'busy_seconds': busy,
+        'params_used': smoother.params() if smoother.state is not None else None
+    }
+
+# ================= CLI =================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enhancement video atau burst gambar dengan parameter stabil")
+    parser.add_argument('source', help="File video atau pola burst, mis. burst/IMG_%%04d.jpg")
+    parser.add_argument('output', help="File video, atau pola file gambar (berisi %%) untuk burst")
+    parser.add_argument('--keyframe-interval', type=int, default=15, help="Analisis setiap N frame (default 15)")
+    parser.add_argument('--alpha', type=float, default=0.5,
+                        help="Bobot keyframe baru pada penghalusan parameter, 0-1 (default 0.5)")
+    parser.add_argument('--fourcc', default='mp4v', help="Codec video output (default mp4v)")
+    parser.add_argument('--fps', type=float, default=None, help="FPS output (default sama dengan input)")
+    args = parser.parse_args(argv)
+
+    # Log analisis auto_enhance ke stderr agar stdout CLI tetap berisi JSON
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        summary = enhance_sequence(args.source, args.output, max(1, args.keyframe_interval),
+                                   min(max(args.alpha, 0.0), 1.0), args.fourcc, args.fps)
+    except (ValueError, RuntimeError) as e:
+        print(f"Gagal: {e}", file=sys.stderr)
+        return 1
+    finally:
+        sys.stdout = stdout
+    print(json.dumps(summary, default=float))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: tidak ada flock, store tidak tersedia
+    fcntl = None
+
+# ================= SHARED ORIGINALS STORE =================
+
+# Default di /dev/shm (RAM, dipakai bersama semua proses) jika tersedia
+DEFAULT_FOLDER = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+                              'image_enhancer_originals')
+# Bagian maksimum dari ukuran filesystem folder yang boleh dipakai store
+# (/dev/shm di container Docker default hanya 64 MB)
+MAX_DISK_FRACTION = 0.5
+
+def available():
+    """Store butuh flock (fcntl) untuk mengunci indeks antar proses"""
+    return fcntl is not None
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class SharedImageStore:
+    """
+    Store gambar hasil decode (BGR mentah, .npy) yang dipakai bersama
+    semua worker lewat memory map read-only.
+
+    Gambar ditulis sekali (put) lalu setiap worker memetakannya dengan
+    np.load(mmap_mode='r'): tanpa decode dan tanpa salinan, dan halaman
+    memorinya dipakai bersama di page cache. Indeks kecil index.json
+    (dikunci dengan flock) mencatat ukuran, waktu pakai terakhir, dan
+    PID worker yang sedang memetakan setiap entri (reference count).
+    Jika total ukuran melebihi max_bytes, entri yang paling lama tidak
+    dipakai dan tidak dipetakan worker hidup mana pun dihapus.
+
+    Setiap proses memetakan paling banyak max_mapped entri; entri yang
+    keluar dari daftar ini melepas referensinya. Waktu pakai di indeks
+    hanya diperbarui saat sebuah proses pertama kali memetakan entri.
+
+    max_bytes dibatasi MAX_DISK_FRACTION dari ukuran filesystem folder.
+    Jika tulis tetap gagal (misalnya ENOSPC), put mengembalikan None dan
+    pemanggil memakai array hasil decode-nya sendiri.
+    """
+
+    def __init__(self, folder=DEFAULT_FOLDER, max_bytes=1024 * 1024 * 1024, max_mapped=64):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.max_bytes = min(max_bytes, int(shutil.disk_usage(folder).total * MAX_DISK_FRACTION))
+        self.max_mapped = max_mapped
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._mapped = OrderedDict()    # key -> array read-only (per proses)
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    # ---------- Indeks ----------
+
+    def _path(self, key):
+        # Nama file dari hash key (key berasal dari request, bukan path)
+        return os.path.join(self.folder, hashlib.sha256(key.encode()).hexdigest()[:32] + '.npy')
+
+    @contextmanager
+    def _index(self):
+        """Baca indeks dengan lock eksklusif antar proses; perubahan ditulis saat keluar"""
+        with open(os.path.join(self.folder, 'index.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            path = os.path.join(self.folder, 'index.json')
+            try:
+                with open(path) as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {}
+            before = json.dumps(index, sort_keys=True)
+            yield index
+            if json.dumps(index, sort_keys=True) != before:
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, 'w') as f:
+                    json.dump(index, f)
+                os.replace(tmp, path)
+
+    def _evict(self, index, keep):
+        """Hapus entri LRU tanpa referensi hidup sampai muat max_bytes (lock sudah dipegang)"""
+        total = sum(entry['bytes'] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            entry = index[key]
+            entry['refs'] = [pid for pid in entry['refs'] if pid_alive(pid)]
+            if key == keep or entry['refs']:
+                continue
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            del index[key]
+            total -= entry['bytes']
+            self.evictions += 1
+
+    # ---------- Memory map per proses ----------
+
+    def _local(self):
+        """Daftar map milik proses ini (dikosongkan setelah fork; lock sudah dipegang)"""
+        if self._pid != os.getpid():
+            self._mapped = OrderedDict()
+            self._pid = os.getpid()
+        return self._mapped
+
+    def _map(self, key):
+        """Petakan file entri read-only (ndarray biasa, bukan subclass memmap)"""
+        return np.asarray(np.load(self._path(key), mmap_mode='r'))
+
+    def _remember(self, key, img):
+        """Simpan map di daftar proses; map yang keluar melepas referensinya"""
+        released = []
+        with self._lock:
+            mapped = self._local()
+            mapped[key] = img
+            mapped.move_to_end(key)
+            while len(mapped) > self.max_mapped:
+                released.append(mapped.popitem(last=False)[0])
+        if released:
+            with self._index() as index:
+                for old in released:
+                    entry = index.get(old)
+                    if entry is not None and os.getpid() in entry['refs']:
+                        entry['refs'].remove(os.getpid())
+
+    # ---------- API ----------
+
+    def get(self, key):
+        """Gambar read-only untuk key (zero-copy), None jika belum ada di store"""
+        with self._lock:
+            mapped = self._local()
+            img = mapped.get(key)
+            if img is not None:
+                mapped.move_to_end(key)
+                self.hits += 1
+                return img
+
+        with self._index() as index:
+            entry = index.get(key)
+            if entry is None:
+                img = None
+            else:
+                try:
+                    img = self._map(key)
+                except (OSError, ValueError):
+                    # File hilang/rusak: buang entri dari indeks
+                    del index[key]
+                    img = None
+                else:
+                    entry['last_used'] = time.time()
+                    if os.getpid() not in entry['refs']:
+                        entry['refs'].append(os.getpid())
+        with self._lock:
+            if img is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if img is not None:
+            self._remember(key, img)
+        return img
+
+    def put(self, key, img):
+        """
+        Tulis gambar ke store (menggantikan yang lama) dan kembalikan versi
+        memory map-nya, atau None jika gagal ditulis (misalnya disk penuh).
+        """
+        img = np.ascontiguousarray(img)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                np.save(f, img)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return None
+        with self._index() as index:
+            os.replace(tmp, path)
+            index[key] = {
+                'bytes': img.nbytes,
+                'shape': list(img.shape),
+                'dtype': img.dtype.str,
+                'last_used': time.time(),
+                'refs': [os.getpid()]
+            }
+            self._evict(index, keep=key)
+            mapped = self._map(key)
+        with self._lock:
+            # Map lama (jika ada) tetap valid untuk pemakai yang masih memegangnya
+            self._local().pop(key, None)
+        self._remember(key, mapped)
+        return mapped
+
+    def stats(self):
+        with self._index() as index:
+            entries = len(index)
+            total = sum(entry['bytes'] for entry in index.values())
+        with self._lock:
+            return {
+                'folder': self.folder,
+                'entries': entries,
+                'bytes': total,
+                'max_bytes': self.max_bytes,
+                'mapped': len(self._local()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
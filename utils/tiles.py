@@ -0,0 +1,159 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from utils.analysis import ImageAnalysis, gradient_sum
+
+# ================= STAGE RUNNERS =================
+
+# Tinggi strip default (pixel) untuk pemrosesan bertahap
+STRIP_HEIGHT = 512
+
+def run_direct(fn, img, halo, *args, **kwargs):
+    """Runner default: jalankan stage pada seluruh frame sekaligus"""
+    return fn(img, *args, **kwargs)
+
+def split_strip_height(height, parts, minimum=64):
+    """
+    Tinggi strip untuk membagi gambar setinggi height menjadi kira-kira
+    parts strip. Selalu genap: stage setengah resolusi (nlm_half) butuh
+    setiap strip mulai di baris genap agar grid 2x2-nya sejajar dengan
+    render satu frame.
+    """
+    strip_height = max(minimum, -(-height // parts))
+    return strip_height + strip_height % 2
+
+def gaussian_halo(sigma, float_depth=False):
+    """
+    Radius kernel GaussianBlur dengan ksize=(0, 0) sesuai aturan OpenCV:
+    ksize = round(sigma * (3 untuk uint8, 4 untuk float) * 2 + 1) | 1
+    """
+    if sigma <= 0:
+        return 0
+    ksize = int(round(sigma * (4 if float_depth else 3) * 2 + 1)) | 1
+    return ksize // 2
+
+class StripRunner:
+    """
+    Runner yang memproses gambar per strip horizontal dengan halo.
+
+    Setiap strip diperluas sebanyak halo pixel di atas dan bawah (radius
+    kernel filter stage tersebut), diproses, lalu hanya bagian tengahnya
+    yang disalin ke output. Dengan halo >= radius kernel hasilnya sama
+    dengan pemrosesan satu frame, tetapi buffer sementara (float32, LAB,
+    dsb.) hanya sebesar satu strip.
+
+    halo=None menandai stage global (misalnya CLAHE yang memerlukan
+    histogram per tile dari seluruh frame); stage ini dijalankan pada
+    frame penuh.
+
+    Strip diproses paralel di pool (ThreadPoolExecutor bersama, lihat
+    utils.parallel) jika diberikan, atau di pool sementara jika threads > 1.
+    strip_height dibulatkan ke atas menjadi genap (lihat split_strip_height).
+    """
+
+    def __init__(self, strip_height=STRIP_HEIGHT, threads=1, pool=None):
+        self.strip_height = strip_height + strip_height % 2
+        self.threads = threads
+        self.pool = pool
+
+    def __call__(self, fn, img, halo, *args, **kwargs):
+        dst = kwargs.pop('dst', None)
+        if halo is None:
+            return fn(img, *args, dst=dst, **kwargs)
+
+        h = img.shape[0]
+        # Stage dengan halo tidak boleh menulis in-place: strip berikutnya
+        # masih membaca baris halo dari input.
+        if dst is None or (halo > 0 and dst is img):
+            dst = np.empty_like(img)
+
+        def process(y0):
+            y1 = min(h, y0 + self.strip_height)
+            top = max(0, y0 - halo)
+            bottom = min(h, y1 + halo)
+            strip_dst = None if halo > 0 else dst[y0:y1]
+            res = fn(img[top:bottom], *args, dst=strip_dst, **kwargs)
+            params = None
+            if isinstance(res, tuple):
+                res, params = res
+            if res is not strip_dst:
+                dst[y0:y1] = res[y0 - top:y0 - top + (y1 - y0)]
+            return params
+
+        starts = range(0, h, self.strip_height)
+        if self.pool is not None and len(starts) > 1:
+            results = list(self.pool.map(process, starts))
+        elif self.threads > 1:
+            with ThreadPoolExecutor(max_workers=self.threads) as pool:
+                results = list(pool.map(process, starts))
+        else:
+            results = [process(y0) for y0 in starts]
+
+        params = results[0]
+        return dst if params is None else (dst, params)
+
+# ================= ANALISIS GAMBAR BESAR =================
+
+def downscale_for_analysis(img, long_edge=1920):
+    """Proxy untuk statistik global (brightness, histogram, warna, saturasi)"""
+    h, w = img.shape[:2]
+    scale = long_edge / max(h, w)
+    if scale >= 1.0:
+        return img
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+def strip_moments(values, n):
+    """(jumlah, jumlah kuadrat) dari meanStdDev, tanpa array kuadrat sementara"""
+    mean, std = cv2.meanStdDev(values)
+    mean, std = mean[0, 0], std[0, 0]
+    return mean * n, (std * std + mean * mean) * n
+
+def analyze_tiled(img, strip_height=STRIP_HEIGHT, long_edge=1920):
+    """
+    ImageAnalysis untuk gambar besar dengan memori terbatas.
+
+    Statistik global dihitung dari proxy yang diperkecil (nilainya hampir
+    tidak bergantung pada resolusi). Metrik yang bergantung skala (noise,
+    variance of Laplacian, gradient) dihitung per strip pada resolusi
+    penuh dengan halo 1 pixel dan diakumulasikan, sehingga hasilnya sama
+    dengan analisis satu frame.
+    """
+    analysis = ImageAnalysis(downscale_for_analysis(img, long_edge))
+
+    h = img.shape[0]
+    count = 0
+    noise_sum = noise_sq = 0.0
+    lap_sum = lap_sq = 0.0
+    grad_sum = 0.0
+    for y0 in range(0, h, strip_height):
+        y1 = min(h, y0 + strip_height)
+        top = max(0, y0 - 1)
+        bottom = min(h, y1 + 1)
+        gray = cv2.cvtColor(img[top:bottom], cv2.COLOR_BGR2GRAY)
+        inner = slice(y0 - top, y0 - top + (y1 - y0))
+
+        n = (y1 - y0) * gray.shape[1]
+
+        blur = cv2.GaussianBlur(gray, (3, 3), 0)
+        noise = cv2.subtract(gray, blur, dtype=cv2.CV_16S)[inner]
+        s, sq = strip_moments(noise, n)
+        noise_sum += s
+        noise_sq += sq
+
+        lap = cv2.Laplacian(gray, cv2.CV_16S)[inner]
+        s, sq = strip_moments(lap, n)
+        lap_sum += s
+        lap_sq += sq
+
+        grad_sum += gradient_sum(gray, inner)
+
+        count += n
+
+    # Override metrik cached_property dengan nilai resolusi penuh
+    analysis.__dict__['noise'] = np.sqrt(max(0.0, noise_sq / count - (noise_sum / count) ** 2))
+    analysis.__dict__['laplacian_var'] = max(0.0, lap_sq / count - (lap_sum / count) ** 2)
+    analysis.__dict__['mean_gradient'] = grad_sum / count
+    return analysis